@@ -84,8 +84,14 @@ export async function createProject(nombre, repo_url) {
 // ===============================
 
 export async function getMyProjects() {
+  const token = localStorage.getItem("token");
+
   try {
-    const res = await fetch(`/projects/mine`);   // 👈 usa la ruta RELATIVA
+    const res = await fetch(`/projects/mine`, {   // 👈 usa la ruta RELATIVA
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
 
     return await res.json();
   } catch (err) {
@@ -5,9 +5,46 @@ import "../styles.css";
 import hljs from "highlight.js/lib/common";
 import "highlight.js/styles/github-dark.css";
 
+// Un archivo del template: el contenido se pide solo al abrirlo
+function TemplateFile({ folder, file, content, onOpen, onCopy }) {
+  const codeRef = useRef(null);
+
+  useEffect(() => {
+    if (content !== undefined && codeRef.current) {
+      delete codeRef.current.dataset.highlighted;
+      hljs.highlightElement(codeRef.current);
+    }
+  }, [content]);
+
+  return (
+    <details
+      className="file-details animated"
+      onToggle={(e) => e.target.open && onOpen(folder, file.path)}
+    >
+      <summary className="file-summary">
+        {file.path} <span style={{ color: "#888", fontSize: 12 }}>({(file.size / 1024).toFixed(1)} KB)</span>
+      </summary>
+
+      <pre className="code-snippet">
+        <code ref={codeRef}>{content === undefined ? "Cargando..." : content}</code>
+      </pre>
+
+      <button
+        className="copy-btn"
+        disabled={content === undefined}
+        onClick={() => onCopy(content, file.path)}
+      >
+        Copiar {file.path}
+      </button>
+    </details>
+  );
+}
+
 export default function TemplatesList() {
   const [templates, setTemplates] = useState([]);
   const [error, setError] = useState("");
+  // "<folder>/<ruta>" -> contenido ya descargado
+  const [fileContents, setFileContents] = useState({});
   const navigate = useNavigate();
 
   // NUEVO: estado para iframe/modal
@@ -34,7 +71,8 @@ export default function TemplatesList() {
       return;
     }
 
-    fetch("/api/templates", {
+    // Solo metadatos; el contenido de cada archivo se pide al abrirlo
+    fetch("/api/templates/index?per_page=100", {
       headers: {
         Authorization: `Bearer ${token}`,
       },
@@ -55,13 +93,17 @@ export default function TemplatesList() {
     window.location.href = `/api/templates/${folderName}/download`;
   };
 
-  const handleToggle = (e) => {
-    if (e.target.open) {
-      const blocks = e.target.querySelectorAll("pre code");
-      blocks.forEach((block) => {
-        hljs.highlightElement(block);
-      });
-    }
+  const loadFile = (folder, path) => {
+    const key = `${folder}/${path}`;
+    if (fileContents[key] !== undefined) return;
+
+    const encoded = path.split("/").map(encodeURIComponent).join("/");
+    fetch(`/api/templates/${encodeURIComponent(folder)}/files/${encoded}`)
+      .then((res) => (res.ok ? res.text() : Promise.reject()))
+      .then((text) => setFileContents((prev) => ({ ...prev, [key]: text })))
+      .catch(() =>
+        setFileContents((prev) => ({ ...prev, [key]: "// Error al cargar el archivo" }))
+      );
   };
 
   // NUEVAS funciones para montar/desmontar
@@ -164,19 +206,22 @@ export default function TemplatesList() {
             {/* LISTA DE ARCHIVOS */}
             <h4>Archivos del template:</h4>
 
-            {Object.keys(template.files).map((filename, idx) => (
-              <details key={idx} className="file-details animated" onToggle={handleToggle}>
-                <summary className="file-summary">{filename}</summary>
-
-                <pre className="code-snippet">
-                  <code>{template.files[filename]}</code>
-                </pre>
-
-                <button className="copy-btn" onClick={() => copyCode(template.files[filename], filename)}>
-                  Copiar {filename}
-                </button>
-              </details>
+            {template.files.map((file) => (
+              <TemplateFile
+                key={file.path}
+                folder={template.folder}
+                file={file}
+                content={fileContents[`${template.folder}/${file.path}`]}
+                onOpen={loadFile}
+                onCopy={copyCode}
+              />
             ))}
+
+            {template.files_truncated && (
+              <p style={{ color: "#888", fontSize: 13 }}>
+                Mostrando {template.files.length} de {template.file_count} archivos.
+              </p>
+            )}
           </div>
         ))}
       </div>
@@ -0,0 +1,279 @@
+"""
+Lectura incremental del access log de Nginx para los proyectos.
+
+Un hilo sigue el archivo por offset (como `tail -F`: detecta rotación por
+cambio de inodo o truncado), parsea solo las líneas nuevas y acumula en
+memoria, por host: número de peticiones, bytes enviados y último acceso.
+Solo cuentan los hosts con ruta en el proxy (cualquier otro Host que
+llegue a Nginx se ignora) y los de un proyecto borrado se olvidan.
+
+- Cada poll alimenta a la hibernación con el último acceso del
+  contenedor (sin escribir nada en el camino de la petición).
+- Cada ACCESS_LOG_FLUSH_INTERVAL segundos los `last_access` pendientes se
+  escriben en Roble: una sola actualización por proyecto, sin importar
+  cuántas peticiones recibió.
+
+Formato esperado (log_format `hosting` en proxy/nginx.conf):
+    $msec $host $status $body_bytes_sent "$request"
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+from roble_client import RobleClient
+from nginx_routes import route_registry
+from hibernation import hibernation
+from activity_monitor import monitor
+
+logger = logging.getLogger(__name__)
+
+
+def parse_line(line: str):
+    """
+    Devuelve (timestamp, host, status, bytes) o None si la línea no tiene
+    el formato esperado.
+    """
+    parts = line.split(" ", 4)
+    if len(parts) < 4:
+        return None
+    try:
+        return float(parts[0]), parts[1].lower(), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+
+class AccessLogTailer:
+
+    def __init__(self, path: str = None, roble: RobleClient = None, token_provider=None):
+        self.path = path or os.getenv("ACCESS_LOG_FILE", "/var/log/hosting/access.log")
+        self.poll_interval = float(os.getenv("ACCESS_LOG_POLL_INTERVAL", "2"))
+        self.flush_interval = float(os.getenv("ACCESS_LOG_FLUSH_INTERVAL", "60"))
+
+        self.roble = roble or RobleClient()
+
+        # Token con el que se escriben los last_access en Roble
+        self.token_provider = token_provider or (
+            lambda: os.getenv("ROBLE_SERVICE_TOKEN") or monitor.token
+        )
+
+        # host -> {"requests", "bytes", "last_seen"}
+        self._stats = {}
+        # host -> last_seen pendiente de escribir en Roble
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._inode = None
+        self._partial = ""
+        self._primera_lectura = True
+
+        self.running = False
+
+    # ---------------------------------------------------------
+    # Lectura del archivo
+    # ---------------------------------------------------------
+
+    def _abrir(self):
+        try:
+            f = open(self.path, "r", encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return False
+
+        if self._file:
+            self._file.close()
+        self._file = f
+        self._inode = os.fstat(f.fileno()).st_ino
+        self._partial = ""
+        return True
+
+    def _rotado(self) -> bool:
+        """
+        True si el archivo del path ya no es el que tenemos abierto
+        (logrotate lo movió) o si fue truncado.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return st.st_ino != self._inode or st.st_size < self._file.tell()
+
+    def poll(self) -> int:
+        """
+        Procesa las líneas nuevas. Devuelve cuántas se agregaron.
+        """
+        if self._file is None:
+            primera, self._primera_lectura = self._primera_lectura, False
+            if not self._abrir():
+                return 0
+            # Si el log ya existía al arrancar, solo interesa el tráfico
+            # desde ahora; si apareció después, se lee desde el inicio.
+            if primera:
+                self._file.seek(0, os.SEEK_END)
+
+        count = self._leer()
+
+        if self._rotado():
+            # Terminar lo que quedaba en el archivo viejo y seguir con el nuevo
+            if self._abrir():
+                count += self._leer()
+
+        return count
+
+    def _leer(self) -> int:
+        data = self._file.read()
+        if not data:
+            return 0
+
+        data = self._partial + data
+        *lines, self._partial = data.split("\n")
+
+        batch = {}
+        for line in lines:
+            parsed = parse_line(line)
+            if not parsed:
+                continue
+            ts, host, _, size = parsed
+            agg = batch.setdefault(host, [0, 0, 0.0])
+            agg[0] += 1
+            agg[1] += size
+            agg[2] = max(agg[2], ts)
+
+        self._aplicar(batch)
+        return sum(a[0] for a in batch.values())
+
+    def _aplicar(self, batch: dict):
+        if not batch:
+            return
+
+        upstreams = route_registry.routes()
+
+        # Hosts sin ruta (escaneos, Host inventados): no se acumulan
+        batch = {h: agg for h, agg in batch.items() if h in upstreams}
+
+        with self._lock:
+            for host, (requests_, size, last_seen) in batch.items():
+                stats = self._stats.setdefault(
+                    host, {"requests": 0, "bytes": 0, "last_seen": 0.0}
+                )
+                stats["requests"] += requests_
+                stats["bytes"] += size
+                stats["last_seen"] = max(stats["last_seen"], last_seen)
+                self._pending[host] = stats["last_seen"]
+
+        for host, (_, _, last_seen) in batch.items():
+            container = urlparse(upstreams[host]).hostname
+            if container:
+                hibernation.touch(container, last_seen)
+
+    def forget(self, hosts):
+        """
+        Descarta las estadísticas y accesos pendientes de `hosts`
+        (proyecto eliminado).
+        """
+        with self._lock:
+            for host in hosts:
+                self._stats.pop(host, None)
+                self._pending.pop(host, None)
+
+    # ---------------------------------------------------------
+    # Escritura en Roble
+    # ---------------------------------------------------------
+
+    def _reencolar(self, pending: dict):
+        """
+        Devuelve a pendientes las actualizaciones que no se escribieron
+        (sin pisar accesos más recientes llegados mientras tanto).
+        """
+        with self._lock:
+            for host, ts in pending.items():
+                self._pending[host] = max(ts, self._pending.get(host, 0))
+
+    def flush(self) -> int:
+        """
+        Escribe en Roble el último acceso de cada host con tráfico nuevo.
+        Devuelve cuántos proyectos se actualizaron.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        token = self.token_provider()
+        if not token:
+            # Sin token no se puede escribir; se reintenta en el próximo flush
+            self._reencolar(pending)
+            return 0
+
+        upstreams = route_registry.routes()
+        try:
+            proyectos = self.roble.read_records("proyectos", access_token=token)
+        except Exception:
+            self._reencolar(pending)
+            raise
+
+        by_container = {f"project_{p.get('_id')}".lower(): p for p in proyectos}
+
+        updated = 0
+        fallidos = {}
+        for host, ts in pending.items():
+            container = urlparse(upstreams.get(host, "")).hostname
+            proyecto = by_container.get(container)
+            if not proyecto:
+                continue
+
+            try:
+                self.roble.update_record(
+                    "proyectos",
+                    proyecto["_id"],
+                    {"last_access": datetime.utcfromtimestamp(ts).isoformat()},
+                    access_token=token
+                )
+                updated += 1
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo actualizar last_access de {host}: {e}")
+                fallidos[host] = ts
+
+        if fallidos:
+            self._reencolar(fallidos)
+        return updated
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {host: dict(s) for host, s in self._stats.items()}
+
+    # ---------------------------------------------------------
+    # Loop
+    # ---------------------------------------------------------
+
+    def start(self):
+        if self.running:
+            return
+
+        logger.info(f"▶ Lectura de access log iniciada ({self.path}).")
+        self.running = True
+
+        thread = threading.Thread(target=self.loop, daemon=True)
+        thread.start()
+
+    def loop(self):
+        last_flush = time.time()
+
+        while self.running:
+            try:
+                self.poll()
+                if time.time() - last_flush >= self.flush_interval:
+                    last_flush = time.time()
+                    self.flush()
+            except Exception as e:
+                logger.error(f"❌ Error procesando access log: {e}")
+
+            time.sleep(self.poll_interval)
+
+
+# Instancia global
+access_log = AccessLogTailer()
@@ -1,14 +1,28 @@
 import time
 import threading
 import os
-import requests
 import logging
 
+from roble_client import RobleClient
+from token_cache import token_cache, token_exp
+from metrics import monitor_checks
+
 logger = logging.getLogger(__name__)
 
 class ActivityMonitor:
+    """
+    Vigila la validez del token activo.
+
+    En lugar de preguntarle a Roble cada pocos segundos, lee el `exp` del
+    JWT localmente y solo programa una verificación remota:
+      - poco antes de que expire (o un refresh, si hay refreshToken), o
+      - cada MONITOR_HEARTBEAT segundos como latido de respaldo.
+    Sin token el hilo queda dormido hasta que llegue uno.
+    """
+
     def __init__(self):
         self.token = None
+        self.refresh_token = None
         self.running = False
 
         # Leemos SIEMPRE del .env
@@ -18,26 +32,125 @@ class ActivityMonitor:
         )
         self.contract = os.getenv(
             "ROBLE_CONTRACT",
-            "pc2_394e10a6d2"  
+            "pc2_394e10a6d2"
         )
 
+        # Latido remoto de respaldo y márgenes antes del vencimiento
+        self.heartbeat = float(os.getenv("MONITOR_HEARTBEAT", "900"))
+        self.verify_margin = float(os.getenv("MONITOR_VERIFY_MARGIN", "30"))
+        self.refresh_margin = float(os.getenv("MONITOR_REFRESH_MARGIN", "120"))
+
+        self.roble = RobleClient()
+
+        # Epoch de la próxima verificación (None si no hay token)
+        self.next_check = None
+        self.last_check = None
+        self.last_result = None
+
+        # Último token confirmado contra Roble
+        self._verified_token = None
+
+        self._wake = threading.Event()
+
     # ======================================================
     # ======== TOKEN enviado desde FRONTEND ================
     # ======================================================
 
-    def set_token(self, token: str):
+    def set_token(self, token: str, refresh_token: str = None):
         """
         Recibe el accessToken desde el backend (/auth/use_token)
         y lo guarda en el monitor.
         """
         self.token = token
+        if refresh_token:
+            self.refresh_token = refresh_token
         logger.info(
             f"🔐 Monitor recibió token. Usando contrato '{self.contract}'."
         )
 
+        self._programar()
+        self._wake.set()
+
         if not self.running:
             self.start()
 
+    def clear_token(self):
+        self.token = None
+        self.refresh_token = None
+        self.next_check = None
+        self._wake.set()
+
+    def status(self) -> dict:
+        return {
+            "active": bool(self.token),
+            "expires_at": token_exp(self.token) if self.token else None,
+            "next_check": self.next_check,
+            "last_check": self.last_check,
+            "last_result": self.last_result,
+        }
+
+    # ======================================================
+    # ================ PROGRAMACIÓN ========================
+    # ======================================================
+
+    def _programar(self):
+        now = time.time()
+        next_check = now + self.heartbeat
+
+        exp = token_exp(self.token) if self.token else None
+        if exp is not None:
+            margin = self.refresh_margin if self.refresh_token else self.verify_margin
+            if exp - margin > now:
+                due = exp - margin
+            elif self.refresh_token:
+                # Dentro de la ventana de refresh: refrescar ya
+                due = now
+            elif self._verified_token != self.token:
+                # Llegó ya dentro del margen sin verificar: verificar ahora
+                due = now
+            else:
+                # Dentro del margen y ya verificado: lo siguiente es su
+                # vencimiento, que se detecta sin red
+                due = max(now, exp)
+            next_check = min(next_check, due)
+
+        self.next_check = next_check
+
+    def _verificar(self):
+        token = self.token
+        now = time.time()
+        exp = token_exp(token)
+
+        # Refresh proactivo antes del vencimiento
+        if exp is not None and self.refresh_token and now >= exp - self.refresh_margin:
+            new_tokens = self.roble.refresh_token(self.refresh_token)
+            self.token = new_tokens["accessToken"]
+            self.refresh_token = new_tokens.get("refreshToken", self.refresh_token)
+            self.last_result = "refreshed"
+            logger.info("🔄 Token refrescado por el monitor.")
+            return
+
+        # Vencido según su propio exp: no hace falta preguntarle a Roble
+        if exp is not None and now >= exp:
+            logger.error("❌ Token expirado en monitor.")
+            self.last_result = "expired"
+            self.token = None
+            return
+
+        # Verificación remota real (sin pasar por la caché)
+        token_cache.invalidate(token)
+        try:
+            self.roble.verify_token(token)
+            self.last_result = "valid"
+            self._verified_token = token
+            logger.info("✅ Token válido (monitor).")
+        except Exception as e:
+            logger.error(f"❌ Token inválido en monitor: {e}")
+            self.last_result = "invalid"
+            # Dejamos el monitor sin token hasta que el usuario vuelva a loguearse
+            if self.token == token:
+                self.token = None
+
     # ======================================================
     # ==================== LOOP =============================
     # ======================================================
@@ -55,36 +168,30 @@ class ActivityMonitor:
     def loop(self):
         while self.running:
             if not self.token:
-                logger.warning("⚠ Monitor sin token, esperando login...")
-                time.sleep(5)
+                self.next_check = None
+                # Dormido hasta que llegue un token nuevo
+                self._wake.wait()
+                self._wake.clear()
                 continue
 
-            try:
-                url = f"{self.base_url}/auth/{self.contract}/verify-token"
-                resp = requests.get(
-                    url,
-                    headers={"Authorization": f"Bearer {self.token}"},
-                    timeout=10,
-                )
-
-                if resp.status_code == 200:
-                    logger.info("✅ Token válido (monitor).")
-                else:
-                    logger.error(
-                        "❌ Token inválido en monitor. status=%s body=%s",
-                        resp.status_code,
-                        resp.text[:200],
-                    )
-                    # Dejamos el monitor sin token hasta que el usuario vuelva a loguearse
-                    self.token = None
+            delay = (self.next_check or 0) - time.time()
+            if delay > 0:
+                # set_token/clear_token despiertan el hilo para reprogramar
+                if self._wake.wait(delay):
+                    self._wake.clear()
+                continue
 
+            try:
+                self._verificar()
             except Exception as e:
                 logger.error(f"❌ Error verificando token en monitor: {e}")
+                self.last_result = "error"
                 self.token = None
 
-            time.sleep(10)
+            monitor_checks.inc(self.last_result)
+            self.last_check = time.time()
+            self._programar()
 
 
 # Instancia global
 monitor = ActivityMonitor()
-
@@ -1,28 +1,106 @@
+import asyncio
 from functools import wraps
 from flask import request, jsonify
 from roble_client import RobleClient
+from roble_async import AsyncRobleClient
+from sessions import sessions
 
 roble = RobleClient()
+aroble = AsyncRobleClient(roble)
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def bearer_token():
+    """
+    Token enviado por el usuario en el header Authorization (o None).
+    """
+    auth = request.headers.get("Authorization")
+
+    if not auth or not auth.startswith("Bearer "):
+        return None
+
+    return auth.split(" ")[1]
+
 
 def auth_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         # Leer token enviado por el usuario
-        auth = request.headers.get("Authorization")
+        token = bearer_token()
 
-        if not auth or not auth.startswith("Bearer "):
+        if not token:
             return jsonify({"error": "Token requerido"}), 401
 
-        token = auth.split(" ")[1]
-
         try:
-            # Validar token con Roble
-            user = roble.verify_token(token)
-            request.user = user     # se guarda el usuario para la ruta
-            request.token = token   # también guardamos el token
+            # Validar token con Roble (cacheado en token_cache)
+            data = roble.verify_token(token)
         except Exception:
+            sessions.remove(token)
+            return jsonify({"error": "Token inválido"}), 401
+
+        # Sesión propia de este usuario (nada se comparte entre peticiones
+        # de usuarios distintos)
+        session = sessions.get(token) or sessions.put(token, data.get("user", {}))
+        if not session.user_id:
             return jsonify({"error": "Token inválido"}), 401
 
+        request.session = session
+        request.user = session.user       # se guarda el usuario para la ruta
+        request.user_id = session.user_id
+        request.token = token             # también guardamos el token
+
         return f(*args, **kwargs)
 
     return wrapper
+
+
+async def _resolver_sesion(token):
+    try:
+        data = await aroble.verify_token(token)
+    except Exception as e:
+        sessions.remove(token)
+        raise TokenInvalido() from e
+
+    session = sessions.get(token) or sessions.put(token, data.get("user", {}))
+    if not session.user_id:
+        raise TokenInvalido()
+    return session
+
+
+def auth_required_async(f):
+    """
+    Versión para vistas async: la verificación del token arranca en
+    segundo plano y la vista la recibe en request.auth (awaitable que
+    devuelve la Session), para poder esperarla junto con sus lecturas
+    a Roble (asyncio.gather).
+
+    La vista DEBE hacer `await request.auth` antes de cualquier escritura.
+    Si el token resulta inválido la respuesta de la vista se descarta y se
+    devuelve 401, aunque no lo haya esperado.
+    """
+    @wraps(f)
+    async def wrapper(*args, **kwargs):
+        token = bearer_token()
+
+        if not token:
+            return jsonify({"error": "Token requerido"}), 401
+
+        auth = asyncio.ensure_future(_resolver_sesion(token))
+        request.auth = auth
+        request.token = token
+
+        try:
+            result = await f(*args, **kwargs)
+            await auth
+        except TokenInvalido:
+            return jsonify({"error": "Token inválido"}), 401
+        finally:
+            if not auth.done():
+                auth.cancel()
+
+        return result
+
+    return wrapper
@@ -7,6 +7,9 @@ from flask import Blueprint, request, jsonify
 import logging
 from roble_client import RobleClient
 from activity_monitor import monitor
+from token_cache import token_cache
+from auth_required import bearer_token
+from sessions import sessions
 MANAGER_TOKEN = None
 
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
@@ -150,8 +153,8 @@ def use_token():
         MANAGER_TOKEN = token
         logger.info("🔐 Manager recibió y guardó token correctamente.")
 
-        # Activar monitor
-        monitor.set_token(token)
+        # Activar monitor (con refreshToken, si viene, refresca antes de expirar)
+        monitor.set_token(token, data.get("refreshToken"))
         logger.info("🔐 Token aplicado correctamente al Monitor.")
 
         return jsonify({
@@ -205,15 +208,25 @@ def signup():
 @auth_blueprint.route("/logout", methods=["POST"])
 def logout():
     try:
-        # Se toma el token activo del Monitor
-        token = monitor.token
+        # Token de quien hace la petición (o el activo del Monitor)
+        token = bearer_token() or monitor.token
         if not token:
             return jsonify({"error": "Token inexistente"}), 400
 
-        roble.logout(token)
+        # El token deja de ser válido: sacarlo de la caché de verificación
+        # y del registro de sesiones
+        token_cache.invalidate(token)
+        sessions.remove(token)
 
-        # Se desactiva en el Monitor
-        monitor.token = None
+        # Se desactiva en el Monitor si era el token activo
+        if monitor.token == token:
+            monitor.clear_token()
+
+        # La sesión local ya está cerrada aunque Roble no responda
+        try:
+            roble.logout(token)
+        except Exception as e:
+            logger.warning(f"Logout remoto falló: {e}")
 
         logger.info("LOGOUT SUCCESS")
 
@@ -231,7 +244,7 @@ def logout():
 @auth_blueprint.route("/me", methods=["GET"])
 def me():
     try:
-        token = monitor.token
+        token = bearer_token() or monitor.token
         if not token:
             return jsonify({"error": "Token requerido"}), 401
 
@@ -263,7 +276,7 @@ def refresh():
         new_tokens = roble.refresh_token(refresh_token)
 
         new_access = new_tokens["accessToken"]
-        monitor.set_token(new_access)
+        monitor.set_token(new_access, new_tokens.get("refreshToken"))
 
         logger.info("REFRESH SUCCESS")
 
@@ -281,7 +294,7 @@ def refresh():
 @auth_blueprint.route("/verify", methods=["GET"])
 def verify():
     try:
-        token = monitor.token
+        token = bearer_token() or monitor.token
         if not token:
             return jsonify({"valid": False}), 401
 
@@ -292,3 +305,15 @@ def verify():
 
     except Exception:
         return jsonify({"valid": False}), 401
+
+
+# =============================================================
+# ======================= ESTADO MONITOR =======================
+# =============================================================
+
+@auth_blueprint.route("/monitor", methods=["GET"])
+def monitor_status():
+    """
+    Cuándo vence el token activo y cuándo es la próxima verificación.
+    """
+    return jsonify(monitor.status()), 200
@@ -0,0 +1,271 @@
+"""
+Imágenes base precalentadas por template.
+
+Para cada template con dependencias (flask: requirements.txt,
+template_react: package.json + package-lock.json) el Manager construye
+una imagen base con las dependencias ya instaladas:
+
+    hosting-base-<template>:<hash del manifiesto>
+
+Cuando un repo de usuario trae el Dockerfile del template sin cambios y
+manifiestos idénticos a los del template, su build usa un Dockerfile
+generado que parte de esa base y solo copia el código: sin `pip install`
+ni `npm install`. Si el Dockerfile o los manifiestos difieren, se usa el
+Dockerfile del repo como siempre.
+
+La base y el Dockerfile generado salen del propio Dockerfile del
+template, partido en el primer `COPY . .`: lo anterior (una sola etapa)
+es la base y lo posterior se construye `FROM` la base. Si el Dockerfile
+del template no se puede partir así, ese template no usa base.
+
+Las bases se construyen en segundo plano al arrancar y se reconstruyen
+cuando cambian los manifiestos o el Dockerfile del template (el tag
+cambia con el hash).
+BASE_IMAGES_ENABLED=0 desactiva todo el mecanismo.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+from container_runtime import runtime as default_runtime
+
+logger = logging.getLogger(__name__)
+
+# Label con el hash de manifiestos con el que se construyó la base
+MANIFEST_HASH_LABEL = "hosting.manifest-hash"
+
+# Dockerfile generado dentro del contexto del usuario
+GENERATED_DOCKERFILE = ".hosting-base.Dockerfile"
+
+# Manifiestos de dependencias de cada template con base
+RECIPES = {
+    "flask": {"manifests": ["requirements.txt"]},
+    "template_react": {"manifests": ["package.json", "package-lock.json"]},
+}
+
+
+def normalizar_dockerfile(content: str) -> str:
+    """
+    Dockerfile sin comentarios, líneas vacías, continuaciones de línea
+    ni espacios repetidos.
+    """
+    lines = []
+    pending = ""
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.endswith("\\"):
+            pending += line[:-1] + " "
+            continue
+        lines.append(re.sub(r"\s+", " ", pending + line).strip())
+        pending = ""
+    if pending:
+        lines.append(re.sub(r"\s+", " ", pending).strip())
+    return "\n".join(lines)
+
+
+def dividir_dockerfile(normalized: str):
+    """
+    Parte el Dockerfile (normalizado) en el primer `COPY . .`.
+    Devuelve (Dockerfile base, Dockerfile de la app con `{base}`), o
+    (None, None) si antes del COPY no hay exactamente una etapa.
+    """
+    lines = normalized.split("\n")
+    try:
+        split = lines.index("COPY . .")
+    except ValueError:
+        return None, None
+
+    pre, post = lines[:split], lines[split:]
+    froms = [l for l in pre if l.upper().startswith("FROM ")]
+    if not pre or len(froms) != 1 or not pre[0].upper().startswith("FROM "):
+        return None, None
+
+    # "FROM imagen AS etapa": la base es la imagen; la app conserva el alias
+    parts = pre[0].split()
+    alias = f" AS {parts[3]}" if len(parts) == 4 and parts[2].upper() == "AS" else ""
+    if len(parts) not in (2, 4) or (len(parts) == 4 and not alias):
+        return None, None
+
+    base = "\n".join([f"FROM {parts[1]}"] + pre[1:]) + "\n"
+    app = "\n".join([f"FROM {{base}}{alias}"] + post) + "\n"
+    return base, app
+
+
+def _leer(path: str):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def manifest_hash(folder: str, manifests: list):
+    """
+    Hash de los manifiestos de dependencias, o None si falta alguno.
+    """
+    h = hashlib.sha256()
+    for name in manifests:
+        raw = _leer(os.path.join(folder, name))
+        if raw is None:
+            return None
+        h.update(name.encode("utf-8") + b"\0" + raw + b"\0")
+    return h.hexdigest()
+
+
+class BaseImageManager:
+
+    def __init__(self, templates_dir: str = None, runtime=None):
+        self.templates_dir = templates_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "templates"
+        )
+        self.runtime = runtime or default_runtime
+        self.enabled = os.getenv("BASE_IMAGES_ENABLED", "1") not in ("0", "false", "no")
+
+        self._locks = {t: threading.Lock() for t in RECIPES}
+
+    # ---------------------------------------------------------
+    # Bases
+    # ---------------------------------------------------------
+
+    def _template(self, template: str):
+        """
+        Receta del template a partir de sus archivos actuales:
+        {"manifests": hash de manifiestos, "dockerfile": normalizado,
+         "base": Dockerfile base, "app": Dockerfile de la app,
+         "digest": hash de manifiestos + base}. None si no tiene base.
+        """
+        folder = os.path.join(self.templates_dir, template)
+        manifests = manifest_hash(folder, RECIPES[template]["manifests"])
+        dockerfile = _leer(os.path.join(folder, "Dockerfile"))
+        if manifests is None or dockerfile is None:
+            return None
+
+        dockerfile = normalizar_dockerfile(dockerfile.decode("utf-8", errors="replace"))
+        base, app = dividir_dockerfile(dockerfile)
+        if base is None:
+            logger.warning(f"⚠️ El Dockerfile de '{template}' no se puede partir en base + app")
+            return None
+
+        return {
+            "manifests": manifests,
+            "dockerfile": dockerfile,
+            "base": base,
+            "app": app,
+            "digest": hashlib.sha256(f"{manifests}:{base}".encode("utf-8")).hexdigest(),
+        }
+
+    @staticmethod
+    def tag(template: str, digest: str) -> str:
+        return f"hosting-base-{template.replace('_', '-')}:{digest[:16]}"
+
+    def ensure(self, template: str):
+        """
+        Devuelve el tag de la base del template, construyéndola si no
+        existe todavía. None si el template no tiene base.
+        """
+        recipe = self._template(template)
+        if recipe is None:
+            return None
+
+        digest = recipe["digest"]
+        tag = self.tag(template, digest)
+
+        with self._locks[template]:
+            if self.runtime.image_label(tag, MANIFEST_HASH_LABEL) == digest:
+                return tag
+
+            logger.info(f"🔥 Construyendo imagen base '{tag}'")
+            folder = os.path.join(self.templates_dir, template)
+
+            context = tempfile.mkdtemp(prefix=f"base-{template}-")
+            try:
+                for name in RECIPES[template]["manifests"]:
+                    shutil.copy2(os.path.join(folder, name), context)
+                with open(os.path.join(context, "Dockerfile"), "w") as f:
+                    f.write(recipe["base"])
+
+                self.runtime.build(
+                    context,
+                    tag=tag,
+                    labels={MANIFEST_HASH_LABEL: digest, "hosting.base-template": template}
+                )
+            finally:
+                shutil.rmtree(context, ignore_errors=True)
+
+        return tag
+
+    def warm_all(self):
+        for template in RECIPES:
+            try:
+                self.ensure(template)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo preparar la base de '{template}': {e}")
+
+    def start(self):
+        """
+        Prepara las bases en segundo plano (no retrasa el arranque).
+        """
+        if not self.enabled:
+            return
+        threading.Thread(target=self.warm_all, daemon=True).start()
+
+    # ---------------------------------------------------------
+    # Builds de usuario
+    # ---------------------------------------------------------
+
+    def match(self, repo_path: str):
+        """
+        Template cuyo Dockerfile y manifiestos coinciden exactamente con
+        los del repo, o None.
+        """
+        dockerfile = _leer(os.path.join(repo_path, "Dockerfile"))
+        if dockerfile is None:
+            return None
+        dockerfile = normalizar_dockerfile(dockerfile.decode("utf-8", errors="replace"))
+
+        for template in RECIPES:
+            recipe = self._template(template)
+            if recipe is None or dockerfile != recipe["dockerfile"]:
+                continue
+            if manifest_hash(repo_path, RECIPES[template]["manifests"]) == recipe["manifests"]:
+                return template
+        return None
+
+    def prepare(self, repo_path: str):
+        """
+        Si el repo puede usar una base precalentada, escribe el Dockerfile
+        generado en el contexto y devuelve (dockerfile, tag_base).
+        Si no, devuelve (None, None) y se usa el Dockerfile del repo.
+        """
+        if not self.enabled:
+            return None, None
+
+        template = self.match(repo_path)
+        if template is None:
+            return None, None
+
+        try:
+            base = self.ensure(template)
+        except Exception as e:
+            logger.warning(f"⚠️ Base de '{template}' no disponible, build completo: {e}")
+            return None, None
+
+        recipe = self._template(template)
+        if recipe is None:
+            return None, None
+
+        with open(os.path.join(repo_path, GENERATED_DOCKERFILE), "w") as f:
+            f.write(recipe["app"].replace("{base}", base))
+
+        return GENERATED_DOCKERFILE, base
+
+
+# Instancia global
+base_images = BaseImageManager()
@@ -0,0 +1 @@
+"""Benchmarks del Manager (ver benchmarks/run.py)."""
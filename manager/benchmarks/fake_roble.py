@@ -0,0 +1,195 @@
+"""
+Servidor HTTP local que imita los endpoints de Roble usados por
+RobleClient (auth/* y database/*), con latencia y tamaño de tablas
+configurables.
+
+Los tokens son JWT sin firma real con `sub`, `email` y `exp`, así que
+token_exp() y la caché de tokens se comportan como con Roble.
+"""
+
+import json
+import time
+import uuid
+import base64
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def _b64(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def make_token(user_id: str, ttl: float = 3600) -> str:
+    payload = {
+        "sub": user_id,
+        "email": f"{user_id}@bench.local",
+        "exp": int(time.time() + ttl),
+    }
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(payload)}.bench"
+
+
+def _decode(token: str):
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except Exception:
+        return None
+
+
+class FakeRoble:
+    """
+    Estado en memoria: usuarios, tablas y contadores de llamadas.
+
+    - users: cantidad de usuarios (user-0 ... user-N)
+    - projects_per_user: filas de `proyectos` (y `containers`) por usuario
+    - latency: segundos de espera antes de cada respuesta
+    """
+
+    def __init__(self, users: int = 50, projects_per_user: int = 20, latency: float = 0.05):
+        self.latency = latency
+        self.tables = {"proyectos": [], "containers": []}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+        for u in range(users):
+            for p in range(projects_per_user):
+                project_id = f"p-{u}-{p}"
+                self.tables["proyectos"].append({
+                    "_id": project_id,
+                    "user_id": f"user-{u}",
+                    "name": f"proyecto{p}",
+                    "rep_url": f"https://example.com/user-{u}/proyecto{p}.git",
+                    "status": "running",
+                    "container_id": f"c-{project_id}",
+                    "host": f"proyecto{p}.user-{u}.localhost",
+                })
+                self.tables["containers"].append({
+                    "_id": f"c-{project_id}",
+                    "project_id": project_id,
+                    "container_id": f"c-{project_id}",
+                })
+
+    def count(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # ---------------------------------------------------------
+    # Endpoints
+    # ---------------------------------------------------------
+
+    def auth(self, action: str, body: dict, headers):
+        if action in ("login", "signup-direct"):
+            user_id = body.get("email", "user-0").split("@")[0]
+            return 200, {
+                "accessToken": make_token(user_id),
+                "refreshToken": make_token(user_id, ttl=86400),
+                "user": {"sub": user_id, "email": body.get("email")},
+            }
+
+        if action == "refresh-token":
+            claims = _decode(body.get("refreshToken", ""))
+            if not claims:
+                return 401, {"message": "refresh token inválido"}
+            return 200, {
+                "accessToken": make_token(claims["sub"]),
+                "refreshToken": body["refreshToken"],
+            }
+
+        if action == "verify-token":
+            auth = headers.get("Authorization", "")
+            claims = _decode(auth[len("Bearer "):]) if auth.startswith("Bearer ") else None
+            if not claims or claims.get("exp", 0) < time.time():
+                return 401, {"message": "token inválido"}
+            return 200, {"valid": True, "user": {"sub": claims["sub"], "email": claims["email"]}}
+
+        return 404, {"message": f"auth/{action} no existe"}
+
+    def database(self, action: str, body: dict, query: dict):
+        with self._lock:
+            if action == "read":
+                table = query.get("tableName", [""])[0]
+                return 200, list(self.tables.get(table, []))
+
+            rows = self.tables.setdefault(body.get("tableName"), [])
+
+            if action == "insert":
+                inserted = [dict(r, _id=uuid.uuid4().hex[:12]) for r in body.get("records", [])]
+                rows.extend(inserted)
+                return 200, {"inserted": inserted, "skipped": []}
+
+            if action == "update":
+                for r in rows:
+                    if r.get(body["idColumn"]) == body["idValue"]:
+                        r.update(body.get("newValues", {}))
+                        return 200, r
+                return 404, {"message": "registro no encontrado"}
+
+            if action == "delete":
+                before = len(rows)
+                rows[:] = [r for r in rows if r.get(body["idColumn"]) != body["idValue"]]
+                return 200, {"deleted": before - len(rows)}
+
+        return 404, {"message": f"database/{action} no existe"}
+
+
+def _handler(roble: FakeRoble):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _dispatch(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")   # [area, contrato, acción]
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+            if roble.latency:
+                time.sleep(roble.latency)
+
+            if len(parts) != 3:
+                status, data = 404, {"message": "ruta desconocida"}
+            elif parts[0] == "auth":
+                roble.count(f"auth/{parts[2]}")
+                status, data = roble.auth(parts[2], body, self.headers)
+            elif parts[0] == "database":
+                roble.count(f"database/{parts[2]}")
+                status, data = roble.database(parts[2], body, parse_qs(url.query))
+            else:
+                status, data = 404, {"message": "ruta desconocida"}
+
+            raw = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+    return Handler
+
+
+class FakeRobleServer:
+    """
+    Levanta FakeRoble en 127.0.0.1 en un puerto libre, en un hilo propio.
+    """
+
+    def __init__(self, roble: FakeRoble):
+        self.roble = roble
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(roble))
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,324 @@
+"""
+Benchmark de punta a punta del Manager.
+
+Levanta un Roble falso (benchmarks/fake_roble.py) y el runtime de
+contenedores en memoria, sirve la app Flask en un puerto local y la
+carga con N clientes concurrentes. Reporta p50/p95/p99 y throughput por
+escenario.
+
+Uso (desde manager/):
+
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 32 --requests 2000 --latency-ms 80
+    python -m benchmarks.run --json bench-antes.json
+    python -m benchmarks.run --compare bench-antes.json
+
+Con --json se guardan resultados, parámetros y commit para comparar
+corridas entre commits (--compare muestra la diferencia).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_roble import FakeRoble, FakeRobleServer, make_token
+
+SCENARIOS = ["projects_mine", "project_get", "templates", "template_download", "deploy"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del Manager")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="lista separada por comas (%(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500,
+                        help="peticiones por escenario")
+    parser.add_argument("--deploys", type=int, default=50,
+                        help="despliegues en el escenario deploy")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50,
+                        help="latencia de cada respuesta del Roble falso")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--projects-per-user", type=int, default=20)
+    parser.add_argument("--build-ms", type=float, default=200,
+                        help="latencia de build del runtime falso")
+    parser.add_argument("--run-ms", type=float, default=50,
+                        help="latencia de run del runtime falso")
+    parser.add_argument("--cold", action="store_true",
+                        help="vaciar cachés de tokens y tablas antes de cada petición")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--json", dest="json_out")
+    parser.add_argument("--compare")
+    return parser.parse_args(argv)
+
+
+# =============================================================
+# Métricas
+# =============================================================
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def resumir(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+        "max_ms": round(values[-1] * 1000, 2) if values else None,
+    }
+
+
+def cargar(fn, total, concurrency, warmup=0):
+    """
+    Ejecuta fn(i) `total` veces con `concurrency` hilos. fn devuelve True
+    si la operación fue exitosa.
+    """
+    for i in range(warmup):
+        fn(i)
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def uno(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(uno, range(warmup, warmup + total)))
+    return resumir(latencies, errors, time.perf_counter() - start)
+
+
+# =============================================================
+# Entorno
+# =============================================================
+
+def preparar_entorno(args, roble_url, workdir):
+    """
+    Variables que los módulos del Manager leen al importarse.
+    """
+    os.environ.update({
+        "ROBLE_URL": roble_url,
+        "ROBLE_CONTRACT": "bench",
+        "CONTAINER_RUNTIME": "fake",
+        "FAKE_RUNTIME_BUILD_DELAY": str(args.build_ms / 1000),
+        "FAKE_RUNTIME_RUN_DELAY": str(args.run_ms / 1000),
+        "HIBERNATE_IDLE_SECONDS": "0",
+        "ACCESS_LOG_FILE": os.path.join(workdir, "access.log"),
+        "NGINX_MAP_FILE": os.path.join(workdir, "projects-map.conf"),
+        "TEMPLATE_ARCHIVE_DIR": os.path.join(workdir, "zips"),
+        "DEPLOY_TMP_DIR": os.path.join(workdir, "deploys"),
+        "ROBLE_POOL_SIZE": str(max(10, args.concurrency)),
+    })
+
+
+def crear_repo_local(workdir):
+    """
+    Repo git mínimo para el escenario de despliegue.
+    """
+    repo = os.path.join(workdir, "repo")
+    os.makedirs(repo)
+    with open(os.path.join(repo, "Dockerfile"), "w") as f:
+        f.write("FROM nginx:alpine\nCOPY index.html /usr/share/nginx/html/\n")
+    with open(os.path.join(repo, "index.html"), "w") as f:
+        f.write("<h1>bench</h1>\n")
+
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@local"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "."], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-qm", "bench"], cwd=repo, check=True)
+    return repo
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# =============================================================
+# Escenarios
+# =============================================================
+
+def escenarios(args, base_url, workdir):
+    import requests
+    from token_cache import token_cache
+    from table_cache import table_cache
+    from templates_routes import TEMPLATE_MAP
+    from deploy_service import DeployService
+
+    local = threading.local()
+    tokens = [make_token(f"user-{u}") for u in range(args.users)]
+    folders = list(TEMPLATE_MAP)
+
+    def http():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def enfriar():
+        if args.cold:
+            token_cache.clear()
+            table_cache.invalidate("proyectos")
+            table_cache.invalidate("containers")
+
+    def get(path, token=None, **headers):
+        enfriar()
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        resp = http().get(base_url + path, headers=headers)
+        resp.content
+        return resp.status_code < 400
+
+    def projects_mine(i):
+        return get("/projects/mine", tokens[i % args.users])
+
+    def project_get(i):
+        u = i % args.users
+        return get(f"/projects/p-{u}-{i % args.projects_per_user}", tokens[u])
+
+    def templates(i):
+        return get("/api/templates", **{"Accept-Encoding": "gzip"})
+
+    def template_download(i):
+        return get(f"/api/templates/{folders[i % len(folders)]}/download")
+
+    repo_url = "file://" + crear_repo_local(workdir)
+    service = DeployService()
+
+    def deploy(i):
+        service.desplegar(
+            project_id=f"bench{i}",
+            repo_url=repo_url,
+            token=tokens[i % args.users],
+            nombre=f"bench{i}",
+            username=f"user-{i % args.users}",
+        )
+        return True
+
+    return {
+        "projects_mine": projects_mine,
+        "project_get": project_get,
+        "templates": templates,
+        "template_download": template_download,
+        "deploy": deploy,
+    }
+
+
+# =============================================================
+# Reporte
+# =============================================================
+
+COLUMNS = ["requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+
+def imprimir(results, baseline=None):
+    header = f"{'escenario':<20}" + "".join(f"{c:>16}" for c in COLUMNS)
+    print(header)
+    print("-" * len(header))
+
+    for name, r in results.items():
+        row = f"{name:<20}"
+        for c in COLUMNS:
+            value = r.get(c)
+            cell = "-" if value is None else str(value)
+            base = (baseline or {}).get(name, {}).get(c)
+            if c.endswith("_ms") or c == "throughput_rps":
+                if value is not None and base:
+                    cell += f" ({(value - base) / base * 100:+.0f}%)"
+            row += f"{cell:>16}"
+        print(row)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="hosting-bench-")
+
+    roble = FakeRoble(
+        users=args.users,
+        projects_per_user=args.projects_per_user,
+        latency=args.latency_ms / 1000,
+    )
+    server = FakeRobleServer(roble).start()
+    preparar_entorno(args, server.url, workdir)
+
+    # Los módulos del Manager leen el entorno al importarse
+    from werkzeug.serving import make_server
+    from manager import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    httpd = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_port}"
+
+    fns = escenarios(args, base_url, workdir)
+
+    results = {}
+    for name in selected:
+        total = args.deploys if name == "deploy" else args.requests
+        warmup = 0 if name == "deploy" else args.warmup
+        results[name] = cargar(fns[name], total, args.concurrency, warmup)
+
+    httpd.shutdown()
+    server.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"\ncommit={commit_actual()} concurrency={args.concurrency} "
+          f"latency={args.latency_ms}ms cold={args.cold}\n")
+    imprimir(results, baseline)
+    print(f"\nllamadas a Roble: {json.dumps(roble.calls, sort_keys=True)}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({
+                "commit": commit_actual(),
+                "label": args.label,
+                "timestamp": time.time(),
+                "params": vars(args),
+                "results": results,
+                "roble_calls": roble.calls,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
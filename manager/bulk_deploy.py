@@ -0,0 +1,261 @@
+"""
+Redeploy masivo de proyectos.
+
+Selecciona proyectos por usuario, template (repositorio de origen) o
+estado y los vuelve a desplegar con un máximo de BULK_DEPLOY_CONCURRENCY
+despliegues simultáneos (configurable por petición, hasta
+BULK_DEPLOY_MAX_CONCURRENCY).
+
+Orden de los builds: los proyectos se agrupan por origen (template o
+repositorio). Primero se despliega un proyecto de cada grupo ("líder")
+y, cuando terminan los líderes, el resto. Así las capas compartidas de
+cada grupo se construyen una sola vez y los demás builds las encuentran
+en la caché de Docker en lugar de construirlas todos a la vez.
+
+Cada proyecto corre como un DeployJob normal (aparece en /projects/jobs
+y respeta la regla de un job activo por proyecto).
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from deploy_jobs import deploy_queue, QUEUED, RUNNING, SUCCEEDED, FAILED
+from template_info import template_de_repo, normalizar_repo
+
+logger = logging.getLogger(__name__)
+
+WAITING = "waiting"
+
+
+def seleccionar(proyectos: list, user_id: str = None, template: str = None,
+                status: str = None) -> list:
+    """
+    Filtra proyectos por dueño, template de origen y/o estado.
+    """
+    elegidos = []
+    for p in proyectos:
+        if user_id and p.get("user_id") != user_id:
+            continue
+        if template and template_de_repo(p.get("rep_url")) != template:
+            continue
+        if status and p.get("status") != status:
+            continue
+        elegidos.append(p)
+    return elegidos
+
+
+def _grupo(proyecto: dict) -> str:
+    template = template_de_repo(proyecto.get("rep_url"))
+    return f"template:{template}" if template else f"repo:{normalizar_repo(proyecto.get('rep_url'))}"
+
+
+def ordenar(proyectos: list):
+    """
+    Devuelve (líderes, resto): un proyecto por grupo primero (grupos más
+    grandes antes) y luego los demás.
+    """
+    grupos = OrderedDict()
+    for p in proyectos:
+        grupos.setdefault(_grupo(p), []).append(p)
+
+    ordenados = sorted(grupos.values(), key=len, reverse=True)
+    lideres = [g[0] for g in ordenados]
+    resto = [p for g in ordenados for p in g[1:]]
+    return lideres, resto
+
+
+class BulkRedeploy:
+
+    def __init__(self, selector: dict, concurrency: int, user_id: str = None):
+        self.id = uuid.uuid4().hex
+        self.selector = selector
+        self.concurrency = concurrency
+        self.user_id = user_id
+
+        self.phase = "leaders"
+        self.created_at = time.time()
+        self.finished_at = None
+
+        # project_id -> {"project_id", "group", "leader", "job", "error"}
+        self.items = OrderedDict()
+
+    def _estado(self, item) -> str:
+        job = item["job"]
+        if job:
+            return job.status
+        return FAILED if item["error"] else WAITING
+
+    def to_dict(self, include_items: bool = True) -> dict:
+        counts = {WAITING: 0, QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        for item in self.items.values():
+            counts[self._estado(item)] += 1
+
+        total = len(self.items)
+        finished = counts[SUCCEEDED] + counts[FAILED]
+
+        data = {
+            "id": self.id,
+            "selector": self.selector,
+            "concurrency": self.concurrency,
+            "phase": self.phase,
+            "total": total,
+            "counts": counts,
+            "progress": round(finished / total, 3) if total else 1.0,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+        if include_items:
+            data["projects"] = [
+                {
+                    "project_id": item["project_id"],
+                    "group": item["group"],
+                    "leader": item["leader"],
+                    "job_id": item["job"].id if item["job"] else None,
+                    "status": self._estado(item),
+                    "stage": item["job"].stage if item["job"] else None,
+                    "error": item["job"].error if item["job"] else item["error"],
+                }
+                for item in self.items.values()
+            ]
+        return data
+
+
+class BulkRedeployManager:
+
+    def __init__(self, queue=None):
+        self.queue = queue or deploy_queue
+        self.default_concurrency = int(os.getenv("BULK_DEPLOY_CONCURRENCY", "4"))
+        self.max_concurrency = int(os.getenv("BULK_DEPLOY_MAX_CONCURRENCY", "16"))
+        self.max_history = int(os.getenv("BULK_DEPLOY_HISTORY", "20"))
+
+        self._bulks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, proyectos: list, token: str, selector: dict,
+              destino, concurrency: int = None, ref: str = None,
+              user_id: str = None) -> BulkRedeploy:
+        """
+        Lanza el redeploy de `proyectos` en segundo plano.
+        `destino(proyecto)` da el (nombre, usuario) del subdominio de cada
+        uno, o None si no tiene: ese proyecto queda como fallido.
+        """
+        concurrency = max(1, min(concurrency or self.default_concurrency, self.max_concurrency))
+        bulk = BulkRedeploy(selector, concurrency, user_id)
+
+        lideres, resto = ordenar(proyectos)
+        for p in lideres + resto:
+            bulk.items[p["_id"]] = {
+                "project_id": p["_id"],
+                "group": _grupo(p),
+                "leader": False,
+                "job": None,
+                "error": None,
+            }
+        for p in lideres:
+            bulk.items[p["_id"]]["leader"] = True
+
+        with self._lock:
+            self._bulks[bulk.id] = bulk
+            while len(self._bulks) > self.max_history:
+                oldest = next(iter(self._bulks.values()))
+                if oldest.finished_at is None:
+                    break
+                self._bulks.popitem(last=False)
+
+        logger.info(
+            f"📦 Redeploy masivo {bulk.id}: {len(proyectos)} proyectos, "
+            f"{len(lideres)} grupos, concurrencia {concurrency}"
+        )
+
+        threading.Thread(
+            target=self._run,
+            args=(bulk, lideres, resto, token, destino, ref),
+            daemon=True
+        ).start()
+        return bulk
+
+    def get(self, bulk_id: str):
+        with self._lock:
+            return self._bulks.get(bulk_id)
+
+    def list(self, user_id: str = None):
+        with self._lock:
+            bulks = list(self._bulks.values())
+        if user_id is not None:
+            bulks = [b for b in bulks if b.user_id == user_id]
+        return bulks
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+
+    def _desplegar(self, bulk, proyecto, token, destino, ref):
+        """
+        Despliega un proyecto del redeploy. Nunca lanza: un proyecto
+        con error queda como fallido sin cortar el resto de la fase.
+        """
+        item = bulk.items[proyecto["_id"]]
+
+        # Todo lo que puede fallar con datos incompletos va antes de
+        # registrar el job, para no dejarlo en cola para siempre
+        try:
+            subdominio = destino(proyecto)
+            kwargs = dict(
+                project_id=proyecto["_id"],
+                repo_url=proyecto["rep_url"],
+                token=token,
+                ref=ref,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Proyecto {proyecto['_id']} omitido del redeploy {bulk.id}: {e!r}")
+            item["error"] = f"Datos del proyecto incompletos: {e!r}"
+            return
+
+        if subdominio is None:
+            logger.warning(f"⚠️ Proyecto {proyecto['_id']} omitido del redeploy {bulk.id}: sin ruta en el proxy")
+            item["error"] = "El proyecto no tiene ruta en el proxy"
+            return
+        kwargs["nombre"], kwargs["username"] = subdominio
+
+        job, created = self.queue.register(proyecto["_id"], proyecto.get("user_id"))
+        item["job"] = job
+
+        if not created:
+            # Ya había un despliegue de este proyecto en curso: se espera
+            job.done.wait()
+            return
+
+        try:
+            self.queue.execute(job, kwargs)
+        except Exception as e:
+            self.queue.fail(job, str(e))
+
+    def _run(self, bulk, lideres, resto, token, destino, ref):
+        try:
+            with ThreadPoolExecutor(
+                max_workers=bulk.concurrency,
+                thread_name_prefix=f"bulk-{bulk.id[:6]}"
+            ) as pool:
+                for phase, proyectos in (("leaders", lideres), ("rest", resto)):
+                    bulk.phase = phase
+                    # Esperar la fase completa antes de la siguiente
+                    list(pool.map(
+                        lambda p: self._desplegar(bulk, p, token, destino, ref),
+                        proyectos
+                    ))
+        except Exception as e:
+            logger.error(f"❌ Error en redeploy masivo {bulk.id}: {e}")
+        finally:
+            bulk.phase = "done"
+            bulk.finished_at = time.time()
+            logger.info(f"✅ Redeploy masivo {bulk.id} terminado")
+
+
+# Instancia global
+bulk_redeploys = BulkRedeployManager()
@@ -0,0 +1,508 @@
+"""
+Abstracción del runtime de contenedores usado por el Manager.
+
+- DockerRuntime: habla con el Docker Engine por el socket unix usando el
+  SDK `docker` y una sola conexión persistente (sin lanzar un proceso
+  `docker` por cada operación).
+- FakeRuntime: implementación en memoria, sin Docker, para pruebas y
+  benchmarks.
+
+CONTAINER_RUNTIME=docker|fake elige la implementación (por defecto docker).
+FAKE_RUNTIME_BUILD_DELAY / FAKE_RUNTIME_RUN_DELAY (segundos) simulan la
+latencia de build y run del runtime en memoria.
+"""
+
+import io
+import os
+import time
+import uuid
+import tarfile
+import logging
+import threading
+import functools
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from metrics import runtime_latency, runtime_errors
+
+logger = logging.getLogger(__name__)
+
+
+# Límites de recursos estándar de los contenedores de proyectos
+PROJECT_CPUS = 0.5
+PROJECT_MEMORY = "256m"
+
+
+class ContainerRuntimeError(Exception):
+    pass
+
+
+class ContainerNotFound(ContainerRuntimeError):
+    pass
+
+
+class ContainerRuntime(ABC):
+    """
+    Operaciones que el Manager necesita sobre imágenes y contenedores.
+    Un runtime incompleto falla al instanciarse.
+    """
+
+    @abstractmethod
+    def build(self, path: str, tag: str, labels: dict = None,
+              dockerfile: str = None) -> dict:
+        """
+        Construye la imagen (con `dockerfile`, relativo a `path`, si se
+        indica). Devuelve {"steps", "cached_steps"}.
+        """
+        ...
+
+    @abstractmethod
+    def image_size(self, image: str):
+        """Tamaño de la imagen en bytes, o None si no existe."""
+        ...
+
+    @abstractmethod
+    def image_label(self, image: str, label: str):
+        """Valor del label en la imagen, o None si no existe."""
+        ...
+
+    @abstractmethod
+    def run(self, image: str, name: str, network: str = None,
+            cpus: float = None, memory: str = None) -> str:
+        """Crea y arranca un contenedor en segundo plano. Devuelve su id."""
+        ...
+
+    @abstractmethod
+    def create(self, image: str, name: str, network: str = None,
+               cpus: float = None, memory: str = None, labels: dict = None,
+               command: list = None) -> str:
+        """Crea el contenedor sin arrancarlo (descarga la imagen si falta). Devuelve su id."""
+        ...
+
+    @abstractmethod
+    def copy_to(self, container: str, src_dir: str, dest: str):
+        """Copia el contenido de `src_dir` a `dest` dentro del contenedor."""
+        ...
+
+    @abstractmethod
+    def rename(self, container: str, new_name: str):
+        ...
+
+    @abstractmethod
+    def list_containers(self, label: str, value: str = None, status: str = None) -> list:
+        """Nombres de los contenedores con ese label (en cualquier estado o solo en `status`)."""
+        ...
+
+    @abstractmethod
+    def start(self, container: str):
+        ...
+
+    @abstractmethod
+    def stop(self, container: str):
+        ...
+
+    @abstractmethod
+    def pause(self, container: str):
+        ...
+
+    @abstractmethod
+    def unpause(self, container: str):
+        ...
+
+    @abstractmethod
+    def status(self, container: str):
+        """Estado del contenedor (running, exited, paused...) o None si no existe."""
+        ...
+
+    @abstractmethod
+    def remove(self, container: str, force: bool = True):
+        """Elimina el contenedor; no falla si no existe."""
+        ...
+
+    @abstractmethod
+    def logs(self, container: str, tail=None, since=None, until=None,
+             follow: bool = False, stream: bool = False):
+        """bytes con los logs, o un iterador de bytes si stream=True."""
+        ...
+
+    @abstractmethod
+    def exec(self, container: str, cmd: list):
+        """Ejecuta `cmd` dentro del contenedor. Devuelve (exit_code, output)."""
+        ...
+
+
+def _sin_git(info: tarfile.TarInfo):
+    """
+    Filtro de tarfile que excluye el directorio .git del repo.
+    """
+    parts = info.name.split("/")
+    return None if ".git" in parts else info
+
+
+# Operaciones medidas en /metrics (duración y errores)
+OPERACIONES = (
+    "build", "image_label", "image_size", "run", "create", "copy_to",
+    "rename", "list_containers", "start", "stop", "pause",
+    "unpause", "status", "remove", "logs", "exec"
+)
+
+
+def _medir(cls):
+    """
+    Envuelve las OPERACIONES de un runtime para medir su duración.
+    """
+    def envolver(nombre, fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(self, *args, **kwargs)
+            except Exception:
+                runtime_errors.inc(nombre)
+                raise
+            finally:
+                runtime_latency.observe(nombre, value=time.perf_counter() - start)
+        return wrapper
+
+    for nombre in OPERACIONES:
+        setattr(cls, nombre, envolver(nombre, cls.__dict__[nombre]))
+    return cls
+
+
+# =============================================================
+# Docker Engine API (SDK)
+# =============================================================
+
+@_medir
+class DockerRuntime(ContainerRuntime):
+
+    def __init__(self, base_url: str = None):
+        self.base_url = base_url or os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock")
+        self.timeout = int(os.getenv("DOCKER_API_TIMEOUT", "120"))
+
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Conexión perezosa: el Manager arranca aunque Docker no esté
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import docker
+                    self._client = docker.DockerClient(
+                        base_url=self.base_url,
+                        timeout=self.timeout
+                    )
+        return self._client
+
+    @contextmanager
+    def _errores(self):
+        import docker.errors
+        try:
+            yield
+        except docker.errors.NotFound as e:
+            raise ContainerNotFound(str(e)) from e
+        except docker.errors.DockerException as e:
+            raise ContainerRuntimeError(str(e)) from e
+
+    def build(self, path, tag, labels=None, dockerfile=None):
+        with self._errores():
+            _, output = self.client.images.build(
+                path=path, tag=tag, labels=labels or {}, rm=True, dockerfile=dockerfile
+            )
+
+        steps = cached = 0
+        for chunk in output:
+            line = chunk.get("stream", "") if isinstance(chunk, dict) else ""
+            if line.startswith("Step "):
+                steps += 1
+            elif "Using cache" in line:
+                cached += 1
+        return {"steps": steps, "cached_steps": cached}
+
+    def image_size(self, image):
+        try:
+            with self._errores():
+                return self.client.images.get(image).attrs.get("Size")
+        except ContainerNotFound:
+            return None
+
+    def image_label(self, image, label):
+        try:
+            with self._errores():
+                img = self.client.images.get(image)
+        except ContainerNotFound:
+            return None
+        return (img.labels or {}).get(label)
+
+    def run(self, image, name, network=None, cpus=None, memory=None):
+        kwargs = {"name": name, "detach": True}
+        if network:
+            kwargs["network"] = network
+        if cpus:
+            kwargs["nano_cpus"] = int(cpus * 1e9)
+        if memory:
+            kwargs["mem_limit"] = memory
+
+        with self._errores():
+            return self.client.containers.run(image, **kwargs).id
+
+    def create(self, image, name, network=None, cpus=None, memory=None, labels=None,
+               command=None):
+        import docker.errors
+
+        kwargs = {"name": name, "labels": labels or {}}
+        if command:
+            kwargs["command"] = command
+        if network:
+            kwargs["network"] = network
+        if cpus:
+            kwargs["nano_cpus"] = int(cpus * 1e9)
+        if memory:
+            kwargs["mem_limit"] = memory
+
+        with self._errores():
+            try:
+                return self.client.containers.create(image, **kwargs).id
+            except docker.errors.ImageNotFound:
+                # `create` no descarga la imagen por su cuenta (a diferencia de `run`)
+                self.client.images.pull(image)
+                return self.client.containers.create(image, **kwargs).id
+
+    def copy_to(self, container, src_dir, dest):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            tar.add(src_dir, arcname=".", filter=_sin_git)
+        buf.seek(0)
+
+        with self._errores():
+            self.client.api.put_archive(container, dest, buf.getvalue())
+
+    def rename(self, container, new_name):
+        with self._errores():
+            self.client.api.rename(container, new_name)
+
+    def list_containers(self, label, value=None, status=None):
+        filters = {"label": f"{label}={value}" if value is not None else label}
+        if status:
+            filters["status"] = status
+        with self._errores():
+            found = self.client.api.containers(all=True, filters=filters)
+        return [c["Names"][0].lstrip("/") for c in found]
+
+    def start(self, container):
+        with self._errores():
+            self.client.api.start(container)
+
+    def stop(self, container):
+        with self._errores():
+            self.client.api.stop(container)
+
+    def pause(self, container):
+        with self._errores():
+            self.client.api.pause(container)
+
+    def unpause(self, container):
+        with self._errores():
+            self.client.api.unpause(container)
+
+    def status(self, container):
+        try:
+            with self._errores():
+                info = self.client.api.inspect_container(container)
+        except ContainerNotFound:
+            return None
+        return info["State"]["Status"]
+
+    def remove(self, container, force=True):
+        try:
+            with self._errores():
+                self.client.api.remove_container(container, force=force)
+        except ContainerNotFound:
+            pass
+
+    def logs(self, container, tail=None, since=None, until=None,
+             follow=False, stream=False):
+        kwargs = {"stream": stream or follow, "follow": follow, "tail": "all" if tail is None else tail}
+        if since is not None:
+            kwargs["since"] = since
+        if until is not None:
+            kwargs["until"] = until
+
+        with self._errores():
+            return self.client.api.logs(container, **kwargs)
+
+    def exec(self, container, cmd):
+        with self._errores():
+            result = self.client.containers.get(container).exec_run(cmd)
+        return result.exit_code, result.output
+
+
+# =============================================================
+# Runtime en memoria
+# =============================================================
+
+@_medir
+class FakeRuntime(ContainerRuntime):
+    """
+    Simula imágenes y contenedores en memoria. Registra cada comando de
+    `exec` en `self.execs` para poder inspeccionarlo. `build_delay` y
+    `run_delay` agregan una latencia fija a build y run.
+    """
+
+    def __init__(self, build_delay: float = 0.0, run_delay: float = 0.0):
+        self.build_delay = build_delay
+        self.run_delay = run_delay
+        self.images = {}       # tag -> labels
+        self.containers = {}   # id -> {"name", "image", "status", "labels", "files", "logs"}
+        self.execs = []
+        self._lock = threading.Lock()
+
+    def _find(self, container):
+        for cid, c in self.containers.items():
+            if cid == container or c["name"] == container:
+                return cid, c
+        raise ContainerNotFound(container)
+
+    def build(self, path, tag, labels=None, dockerfile=None):
+        if self.build_delay:
+            time.sleep(self.build_delay)
+        with self._lock:
+            self.images[tag] = dict(labels or {})
+        return {"steps": 0, "cached_steps": 0}
+
+    def image_size(self, image):
+        with self._lock:
+            return 0 if image in self.images else None
+
+    def image_label(self, image, label):
+        with self._lock:
+            return self.images.get(image, {}).get(label)
+
+    def run(self, image, name, network=None, cpus=None, memory=None):
+        if self.run_delay:
+            time.sleep(self.run_delay)
+        with self._lock:
+            if image not in self.images:
+                raise ContainerNotFound(f"imagen {image}")
+            for c in self.containers.values():
+                if c["name"] == name:
+                    raise ContainerRuntimeError(f"nombre en uso: {name}")
+
+            cid = uuid.uuid4().hex
+            self.containers[cid] = {
+                "name": name,
+                "image": image,
+                "network": network,
+                "status": "running",
+                "labels": {},
+                "files": {},
+                "logs": [],
+            }
+            return cid
+
+    def create(self, image, name, network=None, cpus=None, memory=None, labels=None,
+               command=None):
+        with self._lock:
+            # Simula el pull: cualquier imagen "existe"
+            self.images.setdefault(image, {})
+            for c in self.containers.values():
+                if c["name"] == name:
+                    raise ContainerRuntimeError(f"nombre en uso: {name}")
+
+            cid = uuid.uuid4().hex
+            self.containers[cid] = {
+                "name": name,
+                "image": image,
+                "network": network,
+                "status": "created",
+                "labels": dict(labels or {}),
+                "files": {},
+                "logs": [],
+            }
+            return cid
+
+    def copy_to(self, container, src_dir, dest):
+        with self._lock:
+            self._find(container)[1]["files"][dest] = src_dir
+
+    def rename(self, container, new_name):
+        with self._lock:
+            _, c = self._find(container)
+            for other in self.containers.values():
+                if other is not c and other["name"] == new_name:
+                    raise ContainerRuntimeError(f"nombre en uso: {new_name}")
+            c["name"] = new_name
+
+    def list_containers(self, label, value=None, status=None):
+        with self._lock:
+            return [
+                c["name"] for c in self.containers.values()
+                if label in c["labels"] and (value is None or c["labels"][label] == value)
+                and (status is None or c["status"] == status)
+            ]
+
+    def start(self, container):
+        with self._lock:
+            self._find(container)[1]["status"] = "running"
+
+    def stop(self, container):
+        with self._lock:
+            self._find(container)[1]["status"] = "exited"
+
+    def pause(self, container):
+        with self._lock:
+            self._find(container)[1]["status"] = "paused"
+
+    def unpause(self, container):
+        with self._lock:
+            self._find(container)[1]["status"] = "running"
+
+    def status(self, container):
+        with self._lock:
+            try:
+                return self._find(container)[1]["status"]
+            except ContainerNotFound:
+                return None
+
+    def remove(self, container, force=True):
+        with self._lock:
+            try:
+                cid, _ = self._find(container)
+            except ContainerNotFound:
+                return
+            del self.containers[cid]
+
+    def logs(self, container, tail=None, since=None, until=None,
+             follow=False, stream=False):
+        with self._lock:
+            lines = list(self._find(container)[1]["logs"])
+
+        if tail not in (None, "all"):
+            lines = lines[-int(tail):] if int(tail) > 0 else []
+
+        if stream or follow:
+            return iter(lines)
+        return b"".join(lines)
+
+    def exec(self, container, cmd):
+        with self._lock:
+            self._find(container)
+            self.execs.append((container, list(cmd)))
+        return 0, b""
+
+
+def get_runtime() -> ContainerRuntime:
+    kind = os.getenv("CONTAINER_RUNTIME", "docker").lower()
+    if kind == "fake":
+        logger.info("🧪 Usando runtime de contenedores en memoria")
+        return FakeRuntime(
+            build_delay=float(os.getenv("FAKE_RUNTIME_BUILD_DELAY", "0")),
+            run_delay=float(os.getenv("FAKE_RUNTIME_RUN_DELAY", "0")),
+        )
+    return DockerRuntime()
+
+
+# Instancia global
+runtime = get_runtime()
@@ -0,0 +1,193 @@
+"""
+Cola de despliegues en segundo plano.
+
+`DeployService.desplegar` puede tardar minutos (clone + build + run), así
+que las rutas solo encolan un job y devuelven su id de inmediato. Un pool
+acotado de hilos ejecuta los despliegues y el estado/etapa de cada job se
+puede consultar mientras avanza.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from deploy_service import DeployService
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class DeployJob:
+
+    def __init__(self, project_id: str, user_id: str = None):
+        self.id = uuid.uuid4().hex
+        self.project_id = project_id
+        self.user_id = user_id
+
+        self.status = QUEUED
+        self.stage = None
+
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.result = None
+        self.error = None
+
+        # Se marca al terminar (éxito o error)
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class DeployQueue:
+
+    def __init__(self, service: DeployService = None):
+        self.max_workers = int(os.getenv("DEPLOY_WORKERS", "2"))
+
+        # Cuántos jobs terminados se conservan para consulta
+        self.max_history = int(os.getenv("DEPLOY_JOB_HISTORY", "200"))
+
+        self.service = service or DeployService()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="deploy"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # API pública
+    # ---------------------------------------------------------
+
+    def submit(self, project_id: str, repo_url: str, token: str,
+               nombre: str, username: str, user_id: str = None,
+               ref: str = None) -> DeployJob:
+        """
+        Encola el despliegue y devuelve el job sin esperar a que corra.
+        Si el proyecto ya tiene un job en cola o en curso, se devuelve ese
+        mismo job (dos builds simultáneos pisarían el mismo contenedor).
+        """
+        job, created = self.register(project_id, user_id)
+        if not created:
+            return job
+
+        logger.info(f"📥 Despliegue encolado: job={job.id} proyecto={project_id}")
+
+        self._executor.submit(
+            self.execute, job,
+            dict(project_id=project_id, repo_url=repo_url, token=token,
+                 nombre=nombre, username=username, ref=ref)
+        )
+        return job
+
+    def register(self, project_id: str, user_id: str = None):
+        """
+        Crea el job del proyecto sin ejecutarlo. Devuelve (job, creado);
+        si el proyecto ya tenía uno activo se devuelve ese con creado=False.
+        Lo usa el redeploy masivo, que ejecuta los jobs en su propio pool.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.project_id == project_id and job.status in ACTIVE_STATES:
+                    return job, False
+
+            job = DeployJob(project_id, user_id)
+            self._jobs[job.id] = job
+            self._trim()
+            return job, True
+
+    def fail(self, job: DeployJob, error: str):
+        """
+        Marca como fallido un job registrado que no llegó a ejecutarse.
+        """
+        job.error = error
+        job.status = FAILED
+        job.finished_at = time.time()
+        job.done.set()
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, active_only: bool = False, user_id: str = None):
+        with self._lock:
+            jobs = list(self._jobs.values())
+
+        if active_only:
+            jobs = [j for j in jobs if j.status in ACTIVE_STATES]
+        if user_id is not None:
+            jobs = [j for j in jobs if j.user_id == user_id]
+        return jobs
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+
+    def _trim(self):
+        """
+        Descarta los jobs terminados más antiguos por encima del límite.
+        Los activos nunca se descartan.
+        """
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status not in ACTIVE_STATES:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _set_stage(self, job: DeployJob, stage: str):
+        job.stage = stage
+        logger.info(f"⏩ job={job.id} etapa={stage}")
+
+    def execute(self, job: DeployJob, kwargs: dict):
+        """
+        Ejecuta el despliegue del job en el hilo actual.
+        """
+        job.status = RUNNING
+        job.started_at = time.time()
+
+        try:
+            job.result = self.service.desplegar(
+                on_stage=lambda stage: self._set_stage(job, stage),
+                deploy_id=job.id,
+                **kwargs
+            )
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+
+# Instancia global
+deploy_queue = DeployQueue()
@@ -8,41 +8,58 @@ Servicio encargado del despliegue de proyectos:
 """
 
 import os
+import stat
+import hashlib
 import subprocess
 import random
-import shutil
 import logging
 
 from roble_client import RobleClient
+from git_cache import GitMirrorCache
+from container_runtime import (
+    runtime as default_runtime, ContainerRuntimeError, PROJECT_CPUS, PROJECT_MEMORY
+)
+from nginx_routes import route_registry
+from hibernation import hibernation
+from metrics import deploy_stage_latency, deploy_latency, deploys
+from deploy_timeline import deploy_timelines
+from base_images import base_images
+from standby_pool import standby_pool
 
 logger = logging.getLogger(__name__)
 
+# Label de la imagen con el hash del contexto con el que se construyó
+CONTEXT_HASH_LABEL = "hosting.context-hash"
+
 
 class DeployService:
     """
     Clase de alto nivel para desplegar proyectos de hosting.
     """
 
-    def __init__(self):
+    def __init__(self, runtime=None, standby=None):
         self.roble = RobleClient()
 
+        # Runtime de contenedores (Docker Engine API o fake en memoria)
+        self.runtime = runtime or default_runtime
+
+        # Contenedores en espera para los repos que coinciden con un template
+        self.standby = standby or standby_pool
+
         # Carpeta temporal donde se clonan los repos
         self.base_tmp_dir = os.getenv("DEPLOY_TMP_DIR", "/tmp/hosting_proyectos")
 
         # Nombre de la red de Docker-Compose (debe existir)
         self.docker_network = os.getenv("DOCKER_NETWORK", "hosting_net")
 
-        # Nombre del contenedor del proxy (para hacer docker exec y recargar nginx)
-        self.proxy_container_name = os.getenv("PROXY_CONTAINER_NAME", "proxy")
-
-        # Archivo compartido proxy/manager con el mapa de subdominios
-        self.nginx_map_file = os.getenv(
-            "NGINX_MAP_FILE",
-            "/etc/nginx/conf.d/projects-map.conf"
-        )
+        # Mapa de subdominios del proxy (escritura atómica + recargas agrupadas)
+        self.routes = route_registry
 
         os.makedirs(self.base_tmp_dir, exist_ok=True)
 
+        # Mirrors git persistentes (solo se descargan objetos nuevos)
+        self.git_cache = GitMirrorCache(self.base_tmp_dir)
+
     # ---------------------------------------------------------
     # Helpers internos
     # ---------------------------------------------------------
@@ -53,40 +70,101 @@ class DeployService:
         """
         return os.path.join(self.base_tmp_dir, f"project_{project_id}")
 
-    def clonar_repo(self, repo_url: str, project_id: str) -> str:
+    def clonar_repo(self, repo_url: str, project_id: str, ref: str = None,
+                    info: dict = None) -> str:
         """
-        Clona el repositorio del usuario en una carpeta temporal.
+        Prepara el código del repositorio del usuario en una carpeta
+        temporal, a partir del mirror local (fetch incremental + worktree).
+        `info` recibe las estadísticas del mirror (bytes descargados...).
         """
         target = self._ruta_repo(project_id)
 
         logger.info(f"📁 Clonando repo '{repo_url}' en {target}")
 
-        # Eliminar si existe
-        if os.path.exists(target):
-            shutil.rmtree(target)
-
         try:
-            subprocess.check_call(["git", "clone", repo_url, target])
+            self.git_cache.checkout(repo_url, target, ref, stats=info)
         except subprocess.CalledProcessError as e:
             raise Exception(f"Error clonando repositorio: {e}")
 
         return target
 
-    def construir_imagen(self, project_id: str, repo_path: str) -> str:
+    def _hash_contexto(self, repo_path: str) -> str:
+        """
+        Hash SHA-256 del contexto de build (rutas, permisos y contenido de
+        cada archivo, incluido el Dockerfile). El directorio .git no cuenta.
+        """
+        h = hashlib.sha256()
+
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = sorted(d for d in dirs if d != ".git")
+
+            for name in sorted(files):
+                if name == ".git":
+                    continue
+
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, repo_path)
+                st = os.lstat(full)
+
+                h.update(rel.encode("utf-8") + b"\0")
+                h.update(oct(stat.S_IMODE(st.st_mode)).encode() + b"\0")
+
+                if stat.S_ISLNK(st.st_mode):
+                    h.update(os.readlink(full).encode("utf-8"))
+                else:
+                    with open(full, "rb") as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                            h.update(chunk)
+                h.update(b"\0")
+
+        return h.hexdigest()
+
+    def _hash_imagen(self, image_name: str):
+        """
+        Devuelve el hash de contexto guardado en la imagen existente,
+        o None si la imagen no existe o no tiene el label.
+        """
+        return self.runtime.image_label(image_name, CONTEXT_HASH_LABEL)
+
+    def construir_imagen(self, project_id: str, repo_path: str, info: dict = None) -> str:
         """
         Construye la imagen Docker usando el Dockerfile del repo.
+        Si ya existe una imagen construida con el mismo contexto
+        (mismo hash), el build se omite. Si el repo coincide con un
+        template, parte de su imagen base precalentada (base_images.py).
+        `info` recibe hash de contexto, base usada, si se omitió el build
+        y los pasos cacheados.
         """
         image_name = f"project_{project_id}".lower()
+        info = {} if info is None else info
+
+        context_hash = self._hash_contexto(repo_path)
+
+        dockerfile, base = base_images.prepare(repo_path)
+        if base:
+            # Una base nueva obliga a reconstruir aunque el código sea igual
+            context_hash = hashlib.sha256(f"{context_hash}:{base}".encode()).hexdigest()
+            info["base_image"] = base
+
+        info["context_hash"] = context_hash
+
+        if self._hash_imagen(image_name) == context_hash:
+            logger.info(f"♻️ Imagen '{image_name}' al día ({context_hash[:12]}), se omite el build")
+            info["build_skipped"] = True
+            return image_name
+
+        info["build_skipped"] = False
 
         logger.info(f"🧱 Construyendo imagen Docker '{image_name}' desde {repo_path}")
 
         try:
-            subprocess.check_call([
-                "docker", "build",
-                "-t", image_name,
-                repo_path
-            ])
-        except subprocess.CalledProcessError as e:
+            info.update(self.runtime.build(
+                repo_path,
+                tag=image_name,
+                labels={CONTEXT_HASH_LABEL: context_hash},
+                dockerfile=dockerfile
+            ) or {})
+        except ContainerRuntimeError as e:
             raise Exception(f"Error construyendo la imagen: {e}")
 
         return image_name
@@ -101,68 +179,82 @@ class DeployService:
         logger.info(f"🐳 Ejecutando contenedor '{container_name}' en red '{self.docker_network}'")
 
         # Por si ya existe un contenedor con el mismo nombre
-        subprocess.call(["docker", "rm", "-f", container_name])
-
-        cmd = [
-            "docker", "run",
-            "-d",
-            "--name", container_name,
-            "--network", self.docker_network,
-            "--cpus", "0.5",
-            "--memory", "256m",
-            image_name
-        ]
+        self.runtime.remove(container_name, force=True)
 
         try:
-            container_id = subprocess.check_output(cmd, text=True).strip()
-        except subprocess.CalledProcessError as e:
+            container_id = self.runtime.run(
+                image_name,
+                name=container_name,
+                network=self.docker_network,
+                cpus=PROJECT_CPUS,
+                memory=PROJECT_MEMORY
+            )
+        except ContainerRuntimeError as e:
             raise Exception(f"Error ejecutando el contenedor: {e}")
 
         return container_name, container_id
 
-    def actualizar_mapa_nginx(self, nombre: str, username: str, container_name: str):
+    def activar_en_espera(self, project_id: str, entry, repo_path: str):
         """
-        Añade/actualiza la entrada correspondiente en el archivo de mapa de Nginx:
-            nombre.username.localhost  http://container_name:3000;
-        y recarga la configuración del proxy.
+        Ejecuta el proyecto en un contenedor tomado del pool en espera:
+        solo se copia el código y se arranca (sin build ni create).
         """
-        os.makedirs(os.path.dirname(self.nginx_map_file), exist_ok=True)
+        container_name = f"project_{project_id}".lower()
 
-        host = f"{nombre}.{username}.localhost"
-        linea = f"{host} http://{container_name}:3000;\n"
+        logger.info(f"⚡ Usando contenedor en espera '{entry.name}' para '{container_name}'")
 
-        logger.info(f"📝 Actualizando mapa de Nginx en {self.nginx_map_file}")
-        logger.info(f"    {host}  →  http://{container_name}:3000")
+        try:
+            container_id = self.standby.activate(entry, container_name, repo_path)
+        except ContainerRuntimeError as e:
+            raise Exception(f"Error activando el contenedor en espera: {e}")
 
-        
-        with open(self.nginx_map_file, "a") as f:
-            f.write(linea)
+        return container_name, container_id
 
-        # Recargar Nginx dentro del contenedor "proxy"
-        logger.info("🔁 Recargando Nginx dentro del contenedor del proxy")
-        subprocess.call([
-            "docker", "exec",
-            self.proxy_container_name,
-            "nginx", "-s", "reload"
-        ])
+    def actualizar_mapa_nginx(self, nombre: str, username: str, container_name: str):
+        """
+        Añade/actualiza la entrada correspondiente en el mapa de Nginx:
+            nombre.username.localhost  http://container_name:3000;
+        La recarga del proxy la agrupa el registro de rutas.
+        """
+        host = f"{nombre}.{username}.localhost"
+        self.routes.set(host, f"http://{container_name}:3000")
 
     # ---------------------------------------------------------
     # Método principal
     # ---------------------------------------------------------
 
     def desplegar(self, project_id: str, repo_url: str, token: str,
-                  nombre: str, username: str) -> dict:
+                  nombre: str, username: str, on_stage=None,
+                  ref: str = None, deploy_id: str = None) -> dict:
         """
         Orquesta todos los pasos del despliegue:
 
          1. Marcar proyecto como "building" en Roble (si tienes ese método)
          2. Clonar repositorio
-         3. Construir imagen
+         3. Construir imagen (o tomar un contenedor en espera, standby_pool.py)
          4. Ejecutar contenedor
          5. Actualizar mapa de Nginx
          6. Marcar proyecto como "running"
+
+        `on_stage(nombre_etapa)` se llama al comenzar cada etapa
+        (lo usa la cola de despliegues para reportar el progreso).
+        `ref` es la rama/tag/commit a desplegar (por defecto HEAD).
+        Cada etapa queda registrada en deploy_timelines con `deploy_id`.
         """
 
+        timeline = deploy_timelines.start(
+            project_id, deploy_id=deploy_id, ref=ref,
+            on_stage_end=lambda stage, seconds: deploy_stage_latency.observe(stage, value=seconds)
+        )
+
+        def etapa(nombre_etapa):
+            if nombre_etapa == "done":
+                timeline.end()
+            else:
+                timeline.begin(nombre_etapa)
+            if on_stage:
+                on_stage(nombre_etapa)
+
         logger.info(f"🚀 Iniciando despliegue del proyecto {project_id}")
 
     
@@ -178,15 +270,48 @@ class DeployService:
 
         try:
             # 1. Clonar repositorio
-            repo_path = self.clonar_repo(repo_url, project_id)
-
-            # 2. Construir imagen
-            image = self.construir_imagen(project_id, repo_path)
+            etapa("clone")
+            clone_info = {}
+            repo_path = self.clonar_repo(repo_url, project_id, ref, info=clone_info)
+            timeline.detail(**clone_info)
+
+            def construir():
+                build_info = {}
+                image = self.construir_imagen(project_id, repo_path, info=build_info)
+                timeline.detail(**build_info, image_size=self.runtime.image_size(image))
+                return image
+
+            # 2. Construir imagen (o tomar un contenedor en espera del template)
+            etapa("build")
+            standby = self.standby.claim(repo_path)
+            if standby:
+                image = standby.image
+                timeline.detail(standby=standby.template, build_skipped=True)
+            else:
+                image = construir()
 
             # 3. Ejecutar contenedor
-            container_name, container_id = self.ejecutar_contenedor(project_id, image)
+            etapa("run")
+            container_name = None
+            if standby:
+                try:
+                    container_name, container_id = self.activar_en_espera(project_id, standby, repo_path)
+                except Exception as e:
+                    # Se sigue por el camino normal, en etapas nuevas: build + run
+                    logger.warning(f"⚠️ {e}; se construye la imagen")
+                    timeline.detail(standby_error=str(e))
+                    timeline.end("error")
+                    etapa("build")
+                    image = construir()
+                    etapa("run")
+            if container_name is None:
+                container_name, container_id = self.ejecutar_contenedor(project_id, image)
+            hibernation.forget(container_name)
+            hibernation.touch(container_name)
+            timeline.detail(container_status=self.runtime.status(container_name))
 
             # 4. Actualizar mapa del proxy (subdominio → contenedor)
+            etapa("proxy")
             self.actualizar_mapa_nginx(nombre, username, container_name)
 
             # 5. Actualizar estado a "running"
@@ -201,9 +326,15 @@ class DeployService:
             except Exception as e:
                 logger.warning(f"⚠️ No se pudo actualizar estado a 'running' en Roble: {e}")
 
+            etapa("done")
+            timeline.finish("success")
+            deploy_timelines.save(timeline)
+            deploy_latency.observe("success", value=timeline.duration)
+            deploys.inc("success")
             logger.info(f"✅ Despliegue exitoso del proyecto {project_id}")
 
             return {
+                "deploy_id": timeline.deploy_id,
                 "image": image,
                 "container_name": container_name,
                 "container_id": container_id
@@ -211,6 +342,10 @@ class DeployService:
 
         except Exception as e:
             logger.error(f"❌ Error durante el despliegue: {e}")
+            timeline.finish("error", str(e))
+            deploy_timelines.save(timeline)
+            deploy_latency.observe("error", value=timeline.duration)
+            deploys.inc("error")
 
             # Estado en error
             try:
@@ -225,7 +360,7 @@ class DeployService:
 
             # Intentar limpiar contenedor si se creó algo
             try:
-                subprocess.call(["docker", "rm", "-f", f"project_{project_id}"])
+                self.runtime.remove(f"project_{project_id}".lower(), force=True)
             except Exception:
                 pass
 
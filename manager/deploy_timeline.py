@@ -0,0 +1,225 @@
+"""
+Línea de tiempo de cada despliegue.
+
+Cada llamada a DeployService.desplegar produce un registro con el inicio,
+fin y duración de cada etapa (clone, build, run, proxy) y sus detalles:
+bytes descargados por git, tamaño de la imagen, pasos de build
+cacheados, estado final del contenedor, resultado y error.
+
+Se guardan los últimos DEPLOY_TIMELINE_HISTORY despliegues de cada
+proyecto, en memoria y en disco (un JSON por proyecto en
+DEPLOY_TIMELINE_DIR, escrito de forma atómica), para poder comparar
+despliegues y ver qué etapa empeoró.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+import statistics
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class DeployTimeline:
+
+    def __init__(self, project_id: str, deploy_id: str = None, ref: str = None,
+                 on_stage_end=None):
+        self.project_id = project_id
+        self.deploy_id = deploy_id or uuid.uuid4().hex[:12]
+        self.ref = ref
+        self.started_at = time.time()
+        self.finished_at = None
+        self.status = "running"
+        self.error = None
+        self.stages = []
+
+        # on_stage_end(nombre, duración) al cerrar cada etapa
+        self.on_stage_end = on_stage_end
+        self._current = None
+        self._perf = None
+
+    def begin(self, name: str):
+        """
+        Cierra la etapa en curso (si hay) y abre `name`.
+        """
+        self.end()
+        self._current = {"name": name, "started_at": time.time()}
+        self._perf = time.perf_counter()
+        self.stages.append(self._current)
+
+    def detail(self, **values):
+        """
+        Agrega detalles a la etapa en curso.
+        """
+        if self._current is not None:
+            self._current.update({k: v for k, v in values.items() if v is not None})
+
+    def end(self, status: str = "ok"):
+        stage = self._current
+        if stage is None:
+            return
+
+        duration = time.perf_counter() - self._perf
+        stage["ended_at"] = time.time()
+        stage["duration"] = round(duration, 4)
+        stage["status"] = status
+        self._current = None
+
+        if self.on_stage_end:
+            self.on_stage_end(stage["name"], duration)
+
+    def finish(self, status: str, error: str = None):
+        self.end("ok" if status == "success" else "error")
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    @property
+    def duration(self):
+        if self.finished_at is None:
+            return None
+        return round(self.finished_at - self.started_at, 4)
+
+    def to_dict(self) -> dict:
+        return {
+            "deploy_id": self.deploy_id,
+            "project_id": self.project_id,
+            "ref": self.ref,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+            "stages": [dict(s) for s in self.stages],
+        }
+
+
+class TimelineStore:
+
+    def __init__(self, directory: str = None, history: int = None):
+        self.directory = directory or os.getenv(
+            "DEPLOY_TIMELINE_DIR",
+            os.path.join(os.getenv("DEPLOY_TMP_DIR", "/tmp/hosting_proyectos"), "timelines")
+        )
+        self.history = history or int(os.getenv("DEPLOY_TIMELINE_HISTORY", "20"))
+
+        # project_id -> deque de dicts (más viejo primero)
+        self._projects = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ---------------------------------------------------------
+    # Archivo
+    # ---------------------------------------------------------
+
+    def _path(self, project_id: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", project_id)
+        return os.path.join(self.directory, f"{safe}.json")
+
+    def _history(self, project_id: str) -> deque:
+        """
+        Historial del proyecto (se carga de disco la primera vez).
+        Debe llamarse con el lock tomado.
+        """
+        entries = self._projects.get(project_id)
+        if entries is not None:
+            return entries
+
+        entries = deque(maxlen=self.history)
+        try:
+            with open(self._path(project_id)) as f:
+                entries.extend(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Timeline ilegible de {project_id}: {e}")
+
+        self._projects[project_id] = entries
+        return entries
+
+    def _write(self, project_id: str, entries):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".timeline.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(list(entries), f)
+            os.replace(tmp, self._path(project_id))
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    # ---------------------------------------------------------
+    # API pública
+    # ---------------------------------------------------------
+
+    def start(self, project_id: str, deploy_id: str = None, ref: str = None,
+              on_stage_end=None) -> DeployTimeline:
+        return DeployTimeline(project_id, deploy_id, ref, on_stage_end)
+
+    def save(self, timeline: DeployTimeline):
+        with self._lock:
+            entries = self._history(timeline.project_id)
+            entries.append(timeline.to_dict())
+            try:
+                self._write(timeline.project_id, entries)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo guardar el timeline de {timeline.project_id}: {e}")
+
+    def list(self, project_id: str, limit: int = None) -> list:
+        """
+        Despliegues del proyecto, del más reciente al más viejo.
+        """
+        with self._lock:
+            entries = list(self._history(project_id))
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def get(self, project_id: str, deploy_id: str):
+        for entry in self.list(project_id):
+            if entry["deploy_id"] == deploy_id:
+                return entry
+        return None
+
+    def summary(self, project_id: str) -> dict:
+        """
+        Por etapa: duración del último despliegue exitoso, mediana y
+        máximo del historial (para detectar qué etapa empeoró).
+        """
+        durations = {}
+        for entry in reversed(self.list(project_id)):
+            if entry["status"] != "success":
+                continue
+            for stage in entry["stages"]:
+                if "duration" in stage:
+                    durations.setdefault(stage["name"], []).append(stage["duration"])
+            if entry["duration"] is not None:
+                durations.setdefault("total", []).append(entry["duration"])
+
+        return {
+            name: {
+                "last": values[-1],
+                "median": round(statistics.median(values), 4),
+                "max": max(values),
+                "samples": len(values),
+            }
+            for name, values in durations.items()
+        }
+
+    def forget(self, project_id: str):
+        with self._lock:
+            self._projects.pop(project_id, None)
+            try:
+                os.unlink(self._path(project_id))
+            except FileNotFoundError:
+                pass
+
+
+# Instancia global
+deploy_timelines = TimelineStore()
@@ -0,0 +1,230 @@
+"""
+Caché persistente de repositorios git para los despliegues.
+
+Cada repositorio se guarda como un mirror bare en
+DEPLOY_TMP_DIR/mirrors/<hash>.git. En un redeploy solo se descargan los
+objetos nuevos (`git remote update`) y el código se materializa como un
+worktree liviano del ref pedido, en vez de borrar y clonar todo otra vez.
+
+El ref se valida antes de cualquier llamada a git (no puede empezar con
+`-`) y se resuelve a un commit con `git rev-parse --verify`; un ref que
+no existe es un error del usuario y no toca el mirror. El mirror solo se
+descarta y se vuelve a clonar si falla su actualización o `git fsck`.
+
+Los mirrors se expulsan por LRU (fecha de último uso) cuando el total en
+disco supera GIT_CACHE_MAX_MB. El tamaño de cada mirror lo da
+`git count-objects -v` (sin recorrer el árbol) y se recuerda entre
+despliegues.
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+class RefInvalido(ValueError):
+    """
+    El ref pedido no es válido o no existe en el repositorio.
+    """
+
+
+def validar_ref(ref: str):
+    """
+    Rechaza refs que git interpretaría como opciones o que no pueden
+    ser un nombre de rama/tag/commit.
+    """
+    if ref is None:
+        return
+    if not isinstance(ref, str) or not ref or ref.startswith("-") \
+            or any(c.isspace() or ord(c) < 32 for c in ref):
+        raise RefInvalido(f"ref inválido: {ref!r}")
+
+
+class GitMirrorCache:
+
+    def __init__(self, base_dir: str):
+        self.mirrors_dir = os.path.join(base_dir, "mirrors")
+        self.max_bytes = int(os.getenv("GIT_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+        # Un lock por mirror: dos despliegues del mismo repo no pueden
+        # hacer fetch a la vez sobre el mismo directorio bare.
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+        # mirror -> bytes en disco (según git count-objects)
+        self._sizes = {}
+
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+
+    # ---------------------------------------------------------
+    # Helpers internos
+    # ---------------------------------------------------------
+
+    def _mirror_path(self, repo_url: str) -> str:
+        digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.mirrors_dir, f"{digest}.git")
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _git(self, *args):
+        subprocess.check_call(["git", *args])
+
+    def _actualizar_mirror(self, repo_url: str, mirror: str):
+        if os.path.isdir(mirror):
+            logger.info(f"🔄 Actualizando mirror de '{repo_url}'")
+            self._git("--git-dir", mirror, "remote", "update", "--prune")
+        else:
+            logger.info(f"📦 Creando mirror de '{repo_url}' en {mirror}")
+            self._git("clone", "--mirror", repo_url, mirror)
+
+    def _resolver_ref(self, mirror: str, ref: str) -> str:
+        """
+        Commit al que apunta `ref` en el mirror.
+        """
+        result = subprocess.run(
+            ["git", "--git-dir", mirror, "rev-parse", "--verify", "--quiet",
+             f"{ref}^{{commit}}"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        if result.returncode != 0:
+            raise RefInvalido(f"El ref '{ref}' no existe en el repositorio")
+        return result.stdout.strip()
+
+    def _tamano(self, mirror: str) -> int:
+        """
+        Bytes de objetos del mirror (sueltos + packs + basura), según git.
+        """
+        result = subprocess.run(
+            ["git", "--git-dir", mirror, "count-objects", "-v"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        if result.returncode != 0:
+            return 0
+
+        kib = 0
+        for line in result.stdout.splitlines():
+            key, _, value = line.partition(":")
+            if key in ("size", "size-pack", "size-garbage"):
+                kib += int(value.strip() or 0)
+        return kib * 1024
+
+    def _integro(self, mirror: str) -> bool:
+        result = subprocess.run(
+            ["git", "--git-dir", mirror, "fsck", "--connectivity-only"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        return result.returncode == 0
+
+    def _descartar(self, repo_url: str, mirror: str):
+        logger.warning(f"⚠️ Mirror inválido, se vuelve a clonar: {mirror}")
+        shutil.rmtree(mirror, ignore_errors=True)
+        self._actualizar_mirror(repo_url, mirror)
+
+    def _crear_worktree(self, mirror: str, target: str, commit: str):
+        if os.path.exists(target):
+            shutil.rmtree(target)
+
+        # Olvidar worktrees cuyo directorio ya no existe
+        self._git("--git-dir", mirror, "worktree", "prune")
+        self._git(
+            "--git-dir", mirror,
+            "worktree", "add", "--force", "--detach",
+            target, commit
+        )
+
+    # ---------------------------------------------------------
+    # API pública
+    # ---------------------------------------------------------
+
+    def checkout(self, repo_url: str, target: str, ref: str = None,
+                 stats: dict = None) -> str:
+        """
+        Deja en `target` el contenido de `ref` (por defecto HEAD del
+        remoto) usando el mirror local del repositorio. Lanza
+        RefInvalido si el ref no es válido o no existe.
+
+        Si se pasa `stats`, se completa con mirror_hit (el mirror ya
+        existía), bytes_fetched (crecimiento del mirror) y mirror_bytes.
+        """
+        validar_ref(ref)
+        mirror = self._mirror_path(repo_url)
+        ref = ref or "HEAD"
+
+        with self._lock_for(mirror):
+            if stats is not None:
+                stats["mirror_hit"] = os.path.isdir(mirror)
+                before = self._tamano(mirror) if stats["mirror_hit"] else 0
+
+            try:
+                self._actualizar_mirror(repo_url, mirror)
+            except subprocess.CalledProcessError:
+                # Mirror corrupto o incompleto: se descarta y se reintenta
+                # una vez desde cero.
+                self._descartar(repo_url, mirror)
+
+            commit = self._resolver_ref(mirror, ref)
+
+            try:
+                self._crear_worktree(mirror, target, commit)
+            except subprocess.CalledProcessError:
+                if self._integro(mirror):
+                    raise
+                self._descartar(repo_url, mirror)
+                self._crear_worktree(mirror, target, self._resolver_ref(mirror, ref))
+
+            size = self._sizes[mirror] = self._tamano(mirror)
+            if stats is not None:
+                stats["mirror_bytes"] = size
+                stats["bytes_fetched"] = max(0, size - before)
+
+            # Marca de último uso para el LRU
+            now = time.time()
+            os.utime(mirror, (now, now))
+
+        self.evict(keep=mirror)
+        return target
+
+    def evict(self, keep: str = None):
+        """
+        Borra los mirrors menos usados hasta quedar bajo el presupuesto.
+        """
+        mirrors = []
+        total = 0
+
+        for name in os.listdir(self.mirrors_dir):
+            path = os.path.join(self.mirrors_dir, name)
+            if not os.path.isdir(path):
+                continue
+            size = self._sizes.get(path)
+            if size is None:
+                # Mirror de un arranque anterior: se mide una sola vez
+                size = self._sizes[path] = self._tamano(path)
+            mirrors.append((os.path.getmtime(path), path, size))
+            total += size
+
+        mirrors.sort()
+
+        for _, path, size in mirrors:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            lock = self._lock_for(path)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                logger.info(f"🧹 Expulsando mirror {path} ({size // 1024} KiB)")
+                shutil.rmtree(path, ignore_errors=True)
+                self._sizes.pop(path, None)
+                total -= size
+            finally:
+                lock.release()
@@ -0,0 +1,211 @@
+"""
+Hibernación (scale-to-zero) de los contenedores de proyectos.
+
+Un hilo en segundo plano revisa cada HIBERNATE_CHECK_INTERVAL segundos
+los contenedores publicados en el registro de rutas de Nginx y detiene
+(o pausa, con HIBERNATE_MODE=pause) los que llevan más de
+HIBERNATE_IDLE_SECONDS sin tráfico.
+
+Cuando el proxy recibe una petición para un host hibernado y el upstream
+falla, llama a /_wake/<host>; el Manager arranca el contenedor, espera a
+que acepte conexiones y le devuelve al cliente una redirección 307 a la
+misma URL para que la petición se reenvíe al contenedor ya despierto.
+
+Solo se despiertan los contenedores que hibernó este módulo: uno detenido
+por su dueño (/projects/stop) o caído no lo arranca cualquier visitante.
+`forget` lo quita del conjunto (stop manual, deploy, borrado).
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlparse
+
+from container_runtime import runtime as default_runtime, ContainerRuntimeError
+from nginx_routes import route_registry
+
+logger = logging.getLogger(__name__)
+
+HIBERNATED_STATES = ("exited", "paused", "created")
+
+
+class HibernationManager:
+
+    def __init__(self, runtime=None, routes=None):
+        self.runtime = runtime or default_runtime
+        self.routes = routes or route_registry
+
+        self.idle_seconds = float(os.getenv("HIBERNATE_IDLE_SECONDS", "1800"))
+        self.check_interval = float(os.getenv("HIBERNATE_CHECK_INTERVAL", "60"))
+        self.mode = os.getenv("HIBERNATE_MODE", "stop")
+        self.wake_timeout = float(os.getenv("WAKE_TIMEOUT", "30"))
+
+        # container_name -> epoch del último acceso conocido
+        self._last_access = {}
+        self._lock = threading.Lock()
+
+        # Un lock por contenedor para que N peticiones simultáneas al mismo
+        # host hibernado provoquen un solo arranque
+        self._wake_locks = {}
+        self._woken_at = {}
+
+        # Contenedores detenidos/pausados por la hibernación
+        self._hibernated = set()
+
+        self.running = False
+
+    # ---------------------------------------------------------
+    # Actividad
+    # ---------------------------------------------------------
+
+    def touch(self, container: str, ts: float = None):
+        ts = ts or time.time()
+        with self._lock:
+            if ts > self._last_access.get(container, 0):
+                self._last_access[container] = ts
+
+    def forget(self, container: str):
+        """
+        El contenedor dejó de estar hibernado por decisión de otro (stop
+        manual, redeploy, borrado): ya no se despierta con tráfico.
+        """
+        with self._lock:
+            self._hibernated.discard(container)
+
+    def is_hibernated(self, container: str) -> bool:
+        with self._lock:
+            return container in self._hibernated
+
+    def last_access(self, container: str):
+        with self._lock:
+            return self._last_access.get(container)
+
+    def _containers(self) -> dict:
+        """
+        host -> (container_name, port) para cada ruta publicada.
+        """
+        result = {}
+        for host, upstream in self.routes.routes().items():
+            parsed = urlparse(upstream)
+            if parsed.hostname:
+                result[host] = (parsed.hostname, parsed.port or 80)
+        return result
+
+    # ---------------------------------------------------------
+    # Hibernar
+    # ---------------------------------------------------------
+
+    def check(self):
+        """
+        Hiberna los contenedores inactivos. Un contenedor que se ve por
+        primera vez cuenta como recién usado.
+        """
+        now = time.time()
+
+        for container, _ in set(self._containers().values()):
+            with self._lock:
+                last = self._last_access.setdefault(container, now)
+
+            if now - last < self.idle_seconds:
+                continue
+
+            try:
+                if self.runtime.status(container) != "running":
+                    continue
+
+                logger.info(f"💤 Hibernando '{container}' (inactivo {int(now - last)}s)")
+                if self.mode == "pause":
+                    self.runtime.pause(container)
+                else:
+                    self.runtime.stop(container)
+                with self._lock:
+                    self._hibernated.add(container)
+            except ContainerRuntimeError as e:
+                logger.warning(f"⚠️ No se pudo hibernar '{container}': {e}")
+
+    # ---------------------------------------------------------
+    # Despertar
+    # ---------------------------------------------------------
+
+    def _wake_lock(self, container: str) -> threading.Lock:
+        with self._lock:
+            return self._wake_locks.setdefault(container, threading.Lock())
+
+    def _esperar_listo(self, container: str, port: int) -> bool:
+        deadline = time.time() + self.wake_timeout
+        while time.time() < deadline:
+            try:
+                with socket.create_connection((container, port), timeout=1):
+                    return True
+            except OSError:
+                time.sleep(0.2)
+        return False
+
+    def wake(self, host: str) -> bool:
+        """
+        Despierta el contenedor del host si estaba hibernado y espera a que
+        acepte conexiones. Devuelve True si quedó listo; False si el host
+        no existe, no estaba hibernado o no arrancó a tiempo.
+        """
+        target = self._containers().get(host)
+        if not target:
+            return False
+
+        container, port = target
+
+        with self._wake_lock(container):
+            try:
+                status = self.runtime.status(container)
+
+                # Otra petición lo acaba de despertar mientras esperábamos
+                if status == "running":
+                    woken = self._woken_at.get(container, 0)
+                    if time.time() - woken < self.wake_timeout:
+                        return self._esperar_listo(container, port)
+                    return False
+
+                if status not in HIBERNATED_STATES or not self.is_hibernated(container):
+                    return False
+
+                logger.info(f"⏰ Despertando '{container}' para {host}")
+                if status == "paused":
+                    self.runtime.unpause(container)
+                else:
+                    self.runtime.start(container)
+            except ContainerRuntimeError as e:
+                logger.error(f"❌ No se pudo despertar '{container}': {e}")
+                return False
+
+            self.forget(container)
+            self._woken_at[container] = time.time()
+            self.touch(container)
+            return self._esperar_listo(container, port)
+
+    # ---------------------------------------------------------
+    # Loop
+    # ---------------------------------------------------------
+
+    def start(self):
+        # HIBERNATE_IDLE_SECONDS=0 desactiva la hibernación
+        if self.running or self.idle_seconds <= 0:
+            return
+
+        logger.info("▶ Hibernación iniciada.")
+        self.running = True
+
+        thread = threading.Thread(target=self.loop, daemon=True)
+        thread.start()
+
+    def loop(self):
+        while self.running:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Error revisando contenedores inactivos: {e}")
+            time.sleep(self.check_interval)
+
+
+# Instancia global
+hibernation = HibernationManager()
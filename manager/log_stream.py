@@ -0,0 +1,109 @@
+"""
+Helpers para servir logs de contenedores en streaming.
+
+Los logs nunca se cargan completos en memoria: se reenvían por chunks tal
+como llegan del runtime, ya sea como texto plano (chunked) o como
+server-sent events (una línea por evento).
+"""
+
+import os
+from datetime import datetime
+
+# Tamaño máximo de una línea pendiente antes de emitirla igualmente
+MAX_LINE_BYTES = int(os.getenv("LOGS_MAX_LINE_BYTES", str(64 * 1024)))
+
+# tail por defecto de /projects/logs/<id> (respuesta JSON no streaming)
+DEFAULT_TAIL = int(os.getenv("LOGS_DEFAULT_TAIL", "1000"))
+
+# tail máximo de la respuesta JSON (tail=all se limita a este valor)
+MAX_TAIL = int(os.getenv("LOGS_MAX_TAIL", "10000"))
+
+
+def _parse_time(value):
+    """
+    Acepta epoch en segundos (entero o decimal) o fecha ISO-8601.
+    """
+    try:
+        return int(float(value))
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def parse_log_params(args, default_tail="all", max_tail=None) -> dict:
+    """
+    Lee tail/since/until/follow de los query params.
+    Con `max_tail`, tail=all y los valores mayores se limitan a él.
+    Lanza ValueError si alguno no es válido.
+    """
+    params = {"tail": default_tail}
+
+    tail = args.get("tail")
+    if tail is not None and tail != "all":
+        tail = int(tail)
+        if tail < 0:
+            raise ValueError("tail debe ser >= 0")
+        params["tail"] = tail
+    elif tail == "all":
+        params["tail"] = "all"
+
+    if max_tail is not None and (params["tail"] == "all" or params["tail"] > max_tail):
+        params["tail"] = max_tail
+
+    for key in ("since", "until"):
+        value = args.get(key)
+        if value:
+            params[key] = _parse_time(value)
+
+    params["follow"] = args.get("follow", "").lower() in ("1", "true", "yes")
+    return params
+
+
+def _cerrar(stream):
+    close = getattr(stream, "close", None)
+    if close:
+        close()
+
+
+def iter_text(stream):
+    """
+    Reenvía los chunks tal cual; cierra el stream del runtime si el
+    cliente se desconecta.
+    """
+    try:
+        for chunk in stream:
+            yield chunk
+    finally:
+        _cerrar(stream)
+
+
+def iter_sse(stream):
+    """
+    Convierte el stream de bytes en eventos SSE, un evento por línea.
+    Solo se guarda en memoria la línea incompleta (acotada a
+    MAX_LINE_BYTES).
+    """
+    pending = b""
+
+    try:
+        for chunk in stream:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+
+            if len(pending) > MAX_LINE_BYTES:
+                lines.append(pending)
+                pending = b""
+
+            for line in lines:
+                yield _evento(line)
+
+        if pending:
+            yield _evento(pending)
+
+        yield b"event: end\ndata: \n\n"
+    finally:
+        _cerrar(stream)
+
+
+def _evento(line: bytes) -> bytes:
+    text = line.rstrip(b"\r").decode("utf-8", errors="replace")
+    return f"data: {text}\n\n".encode("utf-8")
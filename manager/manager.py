@@ -1,9 +1,19 @@
-from flask import Flask, jsonify, send_from_directory, abort
+from flask import Flask, jsonify, send_file, abort, request, Response, g
 from flask_cors import CORS
 from templates_routes import templates_blueprint
 from auth_routes import auth_blueprint
 from projects_routes import proyectos_blueprint
+from wake_routes import wake_blueprint
+from hibernation import hibernation
+from access_log import access_log
+from base_images import base_images
+from standby_pool import standby_pool
+from table_cache import table_cache
+from template_preview import PreviewCache
+from template_info import TEMPLATE_INFO
+from metrics import registry, http_requests, http_latency, http_in_flight
 import os
+import time
 
 app = Flask(__name__)
 CORS(app)
@@ -12,6 +22,53 @@ CORS(app)
 app.register_blueprint(auth_blueprint, url_prefix="/auth")
 app.register_blueprint(proyectos_blueprint, url_prefix="/projects")
 app.register_blueprint(templates_blueprint)
+app.register_blueprint(wake_blueprint, url_prefix="/_wake")
+
+# Hibernación de contenedores inactivos (scale-to-zero)
+hibernation.start()
+
+# Tráfico por proyecto a partir del access log del proxy
+access_log.start()
+
+# Imágenes base con dependencias ya instaladas por template
+base_images.start()
+
+# Contenedores en espera para primeros despliegues rápidos
+standby_pool.start()
+
+# =============================================================
+# MÉTRICAS (formato Prometheus)
+# =============================================================
+
+def _ruta():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def _metricas_inicio():
+    g.metrics_start = time.perf_counter()
+    http_in_flight.inc(_ruta())
+
+
+@app.after_request
+def _metricas_respuesta(response):
+    start = g.get("metrics_start")
+    if start is not None:
+        route = _ruta()
+        http_latency.observe(route, request.method, value=time.perf_counter() - start)
+        http_requests.inc(route, request.method, str(response.status_code))
+    return response
+
+
+@app.teardown_request
+def _metricas_fin(exc):
+    if g.get("metrics_start") is not None:
+        http_in_flight.dec(_ruta())
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
 @app.get("/")
 def home():
@@ -24,87 +81,27 @@ def health():
         "message": "Manager funcionando correctamente"
     }
 
-# 🎨 Nombres bonitos
-TEMPLATE_INFO = {
-    "flask": {
-        "title": "Aplicación Flask",
-        "description": "Template base para aplicaciones Python usando Flask.",
-        "allowed": [
-            "Dockerfile",
-            "docker-compose.yml",
-            "app.py",
-            "requirements.txt"
-        ],
-        "repo": "https://github.com/Znake-G/flask-template.git"
-    },
-    "static_template": {
-        "title": "Sitio Web Estático",
-        "description": "Template HTML/CSS/JS sencillo.",
-        "allowed": [
-            "Dockerfile",
-            "docker-compose.yml",
-            "index.html"
-        ],
-        "repo": "https://github.com/Znake-G/static-template.git"
-    },
-    "template_react": {
-        "title": "Aplicación React",
-        "description": "Template de aplicación creada con React.",
-        "allowed": [
-            "Dockerfile",
-            "package.json",
-            "package-lock.json",
-            "public/index.html",
-            "src/App.js",
-            "src/App.css",
-            "src/index.js",
-            "src/index.css"
-        ],
-        "repo": "https://github.com/Znake-G/react_template.git"
-    }
-}
-
-VALID_TEMPLATES = list(TEMPLATE_INFO.keys())
-
-
-@app.route("/api/templates", methods=["GET"])
-def get_templates():
-
-    base_path = "/app/templates"
-    result = []
-
-    for folder in VALID_TEMPLATES:
-        template_path = os.path.join(base_path, folder)
-        template = TEMPLATE_INFO[folder]
-
-        files = {}
-
-        # Recorrer archivos permitidos únicamente
-        for allowed in template["allowed"]:
-            abs_path = os.path.join(template_path, allowed)
-
-            if not os.path.exists(abs_path):
-                continue
+@app.get("/api/cache/stats")
+def cache_stats():
+    return jsonify({"tables": table_cache.stats()})
 
-            try:
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            except:
-                content = "(Archivo binario o ilegible)"
+@app.get("/api/usage")
+def usage():
+    return jsonify({"hosts": access_log.stats()})
 
-            files[allowed] = content
 
-        result.append({
-            "id": folder,
-            "title": template["title"],
-            "description": template["description"],
-            "files": files
-        })
+# Preview estático de templates (sin docker extra), con raíz y assets
+# precomprimidos cacheados por template
+previews = PreviewCache(
+    os.path.join(os.path.dirname(__file__), "templates"),
+    {folder: info.get("repo", "") for folder, info in TEMPLATE_INFO.items()}
+)
+previews.start()
 
-    return jsonify({"templates": result})
+# Cache-Control de los assets de la preview (index.html siempre revalida)
+PREVIEW_ASSET_MAX_AGE = int(os.getenv("PREVIEW_ASSET_MAX_AGE", "86400"))
 
 
-# Preview estático de templates (sin docker extra)
 @app.route("/preview/<folder>/", defaults={"path": "index.html"})
 @app.route("/preview/<folder>/<path:path>")
 def preview_template(folder, path):
@@ -113,46 +110,52 @@ def preview_template(folder, path):
 	Search order: build, dist, public, root. If requested file exists serve it,
 	otherwise return index.html (SPA support). If no index.html found, render
 	a minimal HTML listing files + repo link.
+	The resolved root, the listing and compressed assets are cached per
+	template (see template_preview.py).
 	"""
-	base_dir = os.path.join(os.path.dirname(__file__), "templates", folder)
-	candidates = ["build", "dist", "public", ""]  # order to check
-	for c in candidates:
-		root = os.path.join(base_dir, c) if c else base_dir
-		index_file = os.path.join(root, "index.html")
-		if os.path.isdir(root) and os.path.exists(index_file):
-			# if requested path exists, serve it; else serve index.html
-			requested = os.path.join(root, path)
-			if os.path.exists(requested) and os.path.isfile(requested):
-				return send_from_directory(root, path)
-			return send_from_directory(root, "index.html")
-
-	# Si llegamos aquí: no hay index en los lugares esperados.
-	# Si el folder existe, listar archivos y mostrar enlace al repo si existe.
-	if os.path.isdir(base_dir):
-		# construir listado simple
-		items = []
-		for root_dir, dirs, files in os.walk(base_dir):
-			rel = os.path.relpath(root_dir, base_dir)
-			for f in files:
-				items.append(os.path.join(rel if rel != "." else "", f))
-		# obtener repo si está definido en TEMPLATE_INFO
-		repo = TEMPLATE_INFO.get(folder, {}).get("repo", "")
-		html = ["<html><head><meta charset='utf-8'><title>Preview - {}</title></head><body>".format(folder)]
-		html.append("<h1>Preview mínimo: {}</h1>".format(folder))
-		if repo:
-			html.append('<p>Repo: <a href="{}" target="_blank" rel="noopener noreferrer">{}</a></p>'.format(repo, repo))
-		if items:
-			html.append("<h3>Archivos:</h3><ul>")
-			for it in sorted(items):
-				html.append("<li>{}</li>".format(it))
-			html.append("</ul>")
-		else:
-			html.append("<p>No hay archivos detectados en este template.</p>")
-		html.append("</body></html>")
-		return ("".join(html), 200, {"Content-Type": "text/html; charset=utf-8"})
-
-	# no se encontró el template
-	abort(404)
+	entry = previews.get(folder)
+	if entry is None:
+		# no se encontró el template
+		abort(404)
+
+	if entry.root is None:
+		# No hay index en los lugares esperados: listado de archivos
+		return (entry.listing, 200, {"Content-Type": "text/html; charset=utf-8"})
+
+	# index.html solo para rutas que no existen (soporte SPA)
+	asset = entry.assets.get(path)
+	if asset is None:
+		asset = entry.assets.get("index.html")
+	if asset is None or not os.path.exists(asset.path):
+		abort(404)
+
+	if asset.mimetype == "text/html":
+		cache_control = "no-cache"
+	else:
+		cache_control = f"public, max-age={PREVIEW_ASSET_MAX_AGE}"
+
+	# Codificación elegida; cada una tiene su propio ETag
+	encoding = next(
+		(e for e in ("br", "gzip") if e in asset.variants and request.accept_encodings[e] > 0),
+		None
+	)
+	etag = asset.etag_for(encoding)
+	headers = {
+		"ETag": f'"{etag}"',
+		"Cache-Control": cache_control,
+		"Vary": "Accept-Encoding",
+	}
+
+	if request.if_none_match.contains(etag):
+		return Response(status=304, headers=headers)
+
+	if encoding:
+		headers["Content-Encoding"] = encoding
+		return Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
+
+	response = send_file(asset.path, mimetype=asset.mimetype, conditional=True, etag=False)
+	response.headers.update(headers)
+	return response
 
 
 if __name__ == "__main__":
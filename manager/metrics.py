@@ -0,0 +1,286 @@
+"""
+Métricas del Manager en formato de texto de Prometheus (/metrics).
+
+Sin dependencias externas. Para que medir no agregue contención en el
+camino caliente, cada hilo escribe en sus propias celdas (un dict por
+hilo y por métrica): incrementar u observar no toma ningún lock. Solo el
+primer uso de una métrica en un hilo registra su celda, y el scrape suma
+las celdas de todos los hilos.
+
+Los hilos se crean y terminan todo el tiempo (asgiref y asyncio.to_thread
+usan uno por petición), así que las celdas de hilos ya terminados se
+acumulan en un total base y se descartan: la lista de celdas solo crece
+con los hilos vivos.
+"""
+
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# Buckets de latencia por defecto (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+        self._local = threading.local()
+        self._cells = []   # [(hilo, celda)]
+        self._base = {}    # valores acumulados de hilos ya terminados
+        self._guard = threading.Lock()
+
+    def _cell(self) -> dict:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._local.cell = {}
+            with self._guard:
+                self._reap()
+                self._cells.append((threading.current_thread(), cell))
+        return cell
+
+    @abstractmethod
+    def _fold(self, base: dict, cell: dict):
+        """
+        Suma los valores de `cell` en `base`.
+        """
+
+    def _reap(self):
+        """
+        Acumula en el total base las celdas de hilos terminados (ya no
+        escriben) y las descarta. Debe llamarse con el lock tomado.
+        """
+        vivos = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                vivos.append((thread, cell))
+            else:
+                self._fold(self._base, cell)
+        self._cells = vivos
+
+    def _snapshots(self):
+        with self._guard:
+            self._reap()
+            cells = [c for _, c in self._cells]
+            base = self._base.copy()
+        # dict.copy() es atómico bajo el GIL
+        return [base] + [c.copy() for c in cells]
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        cell = self._cell()
+        cell[labels] = cell.get(labels, 0) + amount
+
+    def _fold(self, base, cell):
+        for labels, v in cell.items():
+            base[labels] = base.get(labels, 0) + v
+
+    def values(self) -> dict:
+        total = {}
+        for snap in self._snapshots():
+            for labels, v in snap.items():
+                total[labels] = total.get(labels, 0) + v
+        return total
+
+    def render(self):
+        lines = self.header()
+        for labels, v in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {v}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Gauge sumable (inc/dec desde cualquier hilo, p. ej. peticiones en
+    vuelo) o calculado en cada scrape con `fn`, que devuelve
+    {tupla_de_labels: valor}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def values(self) -> dict:
+        return self.fn() if self.fn else super().values()
+
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        cell = self._cell()
+        entry = cell.get(labels)
+        if entry is None:
+            # [conteo por bucket..., +Inf], suma
+            entry = cell[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def _fold(self, base, cell):
+        for labels, (counts, total) in cell.items():
+            prev = base.get(labels)
+            if prev is None:
+                base[labels] = [list(counts), total]
+            else:
+                # Entrada nueva: los snapshots ya tomados no se modifican
+                base[labels] = [[a + b for a, b in zip(prev[0], counts)], prev[1] + total]
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def render(self):
+        merged = {}
+        for snap in self._snapshots():
+            for labels, (counts, total) in snap.items():
+                m = merged.setdefault(labels, [[0] * len(counts), 0.0])
+                m[0] = [a + b for a, b in zip(m[0], counts)]
+                m[1] += total
+
+        lines = self.header()
+        for labels, (counts, total) in sorted(merged.items()):
+            acc = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                acc += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                extra = 'le="%s"' % le
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, extra)} {acc}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), fn=None) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames, fn))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro global
+registry = Registry()
+
+
+# =============================================================
+# Métricas compartidas por los módulos del Manager
+# =============================================================
+
+http_requests = registry.counter(
+    "hosting_http_requests_total", "Peticiones HTTP atendidas",
+    ("route", "method", "status"))
+http_latency = registry.histogram(
+    "hosting_http_request_duration_seconds", "Latencia por ruta",
+    ("route", "method"))
+http_in_flight = registry.gauge(
+    "hosting_http_requests_in_flight", "Peticiones en curso por ruta",
+    ("route",))
+
+roble_latency = registry.histogram(
+    "hosting_roble_request_duration_seconds", "Latencia de llamadas HTTP a Roble",
+    ("method",))
+roble_errors = registry.counter(
+    "hosting_roble_errors_total", "Llamadas a Roble fallidas (red o HTTP >= 400)",
+    ("method",))
+
+runtime_latency = registry.histogram(
+    "hosting_runtime_operation_duration_seconds", "Duración de operaciones del runtime de contenedores",
+    ("operation",))
+runtime_errors = registry.counter(
+    "hosting_runtime_errors_total", "Operaciones del runtime de contenedores fallidas",
+    ("operation",))
+
+deploy_stage_latency = registry.histogram(
+    "hosting_deploy_stage_duration_seconds", "Duración de cada etapa del despliegue",
+    ("stage",))
+deploy_latency = registry.histogram(
+    "hosting_deploy_duration_seconds", "Duración total del despliegue por resultado",
+    ("result",))
+deploys = registry.counter(
+    "hosting_deploys_total", "Despliegues terminados por resultado",
+    ("result",))
+
+cache_requests = registry.counter(
+    "hosting_cache_requests_total", "Consultas a las cachés internas",
+    ("cache", "result"))
+
+
+def _hit_ratio():
+    totals = {}
+    for (cache, result), v in cache_requests.values().items():
+        t = totals.setdefault(cache, [0, 0])
+        t[0] += v if result == "hit" else 0
+        t[1] += v
+    return {(cache,): (hits / total if total else 0.0) for cache, (hits, total) in totals.items()}
+
+
+cache_hit_ratio = registry.gauge(
+    "hosting_cache_hit_ratio", "Proporción de aciertos desde el arranque",
+    ("cache",), fn=_hit_ratio)
+
+standby_containers = registry.gauge(
+    "hosting_standby_containers", "Contenedores en espera disponibles por template",
+    ("template",))
+
+monitor_checks = registry.counter(
+    "hosting_monitor_checks_total", "Verificaciones del ActivityMonitor por resultado",
+    ("result",))
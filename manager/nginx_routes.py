@@ -0,0 +1,161 @@
+"""
+Registro de rutas host → upstream del proxy Nginx.
+
+El Manager es el dueño del mapa: lo mantiene en memoria (un host aparece
+una sola vez), reescribe el archivo de forma atómica (archivo temporal +
+rename) y agrupa las recargas de Nginx: varios cambios dentro de
+NGINX_RELOAD_DEBOUNCE segundos producen una sola `nginx -s reload`.
+
+Formato del archivo (incluido dentro de un bloque `map` de Nginx):
+    nombre.usuario.localhost http://project_<id>:3000;
+"""
+
+import os
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+from container_runtime import runtime as default_runtime, ContainerRuntimeError
+
+logger = logging.getLogger(__name__)
+
+
+class RouteRegistry:
+
+    def __init__(self, map_file: str = None, runtime=None):
+        self.map_file = map_file or os.getenv(
+            "NGINX_MAP_FILE",
+            "/etc/nginx/conf.d/projects-map.conf"
+        )
+        self.proxy_container_name = os.getenv("PROXY_CONTAINER_NAME", "proxy")
+        self.reload_delay = float(os.getenv("NGINX_RELOAD_DEBOUNCE", "2"))
+        self.runtime = runtime or default_runtime
+
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+
+        self.reloads = 0
+
+        self._load()
+
+    # ---------------------------------------------------------
+    # Archivo
+    # ---------------------------------------------------------
+
+    def _load(self):
+        """
+        Carga el mapa existente. Si hay hosts repetidos (archivos escritos
+        por versiones anteriores en modo append) gana la última línea.
+        """
+        if not os.path.exists(self.map_file):
+            return
+
+        with open(self.map_file) as f:
+            for line in f:
+                line = line.strip().rstrip(";").strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = line.split()
+                if len(parts) != 2:
+                    continue
+                host, upstream = parts
+                self._routes.pop(host, None)
+                self._routes[host] = upstream
+
+    def _write(self):
+        directory = os.path.dirname(self.map_file) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        content = "".join(
+            f"{host} {upstream};\n" for host, upstream in self._routes.items()
+        )
+
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".projects-map.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.map_file)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    # ---------------------------------------------------------
+    # Recarga de Nginx
+    # ---------------------------------------------------------
+
+    def _schedule_reload(self):
+        # Si ya hay una recarga pendiente, este cambio viaja en ella
+        if self._timer is not None:
+            return
+
+        self._timer = threading.Timer(self.reload_delay, self.reload)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def reload(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        logger.info("🔁 Recargando Nginx dentro del contenedor del proxy")
+        try:
+            self.runtime.exec(self.proxy_container_name, ["nginx", "-s", "reload"])
+            self.reloads += 1
+        except ContainerRuntimeError as e:
+            logger.warning(f"⚠️ No se pudo recargar Nginx: {e}")
+
+    # ---------------------------------------------------------
+    # API pública
+    # ---------------------------------------------------------
+
+    def set(self, host: str, upstream: str):
+        with self._lock:
+            if self._routes.get(host) == upstream:
+                return
+
+            self._routes[host] = upstream
+            self._write()
+            self._schedule_reload()
+
+        logger.info(f"📝 Ruta {host}  →  {upstream}")
+
+    def remove(self, host: str):
+        with self._lock:
+            if self._routes.pop(host, None) is None:
+                return
+
+            self._write()
+            self._schedule_reload()
+
+        logger.info(f"🗑️ Ruta eliminada: {host}")
+
+    def remove_upstream(self, upstream: str):
+        """
+        Elimina todos los hosts que apuntan a `upstream`.
+        """
+        with self._lock:
+            hosts = [h for h, u in self._routes.items() if u == upstream]
+            if not hosts:
+                return
+
+            for host in hosts:
+                del self._routes[host]
+            self._write()
+            self._schedule_reload()
+
+        logger.info(f"🗑️ Rutas eliminadas: {', '.join(hosts)}")
+
+    def routes(self) -> dict:
+        with self._lock:
+            return dict(self._routes)
+
+
+# Instancia global
+route_registry = RouteRegistry()
@@ -2,59 +2,36 @@
 Rutas para gestión de proyectos y contenedores.
 """
 
-from flask import Blueprint, request, jsonify
-from roble_client import RobleClient
+from flask import Blueprint, request, jsonify, Response
 
+import asyncio
 import logging
-import subprocess
-import os
-from activity_monitor import monitor
+from auth_required import auth_required, auth_required_async, aroble, TokenInvalido
+from deploy_jobs import deploy_queue
+from deploy_timeline import deploy_timelines
+from bulk_deploy import bulk_redeploys, seleccionar
+from git_cache import validar_ref, RefInvalido
+from container_runtime import runtime
+from nginx_routes import route_registry
+from hibernation import hibernation
+from access_log import access_log
+from log_stream import parse_log_params, iter_sse, iter_text, DEFAULT_TAIL, MAX_TAIL
 from datetime import datetime
+import os
 
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
 proyectos_blueprint = Blueprint("projects", __name__)
 logger = logging.getLogger(__name__)
 
-roble = RobleClient()
-
-# =============================================================
-# TOKEN GLOBAL
-# =============================================================
-
-def get_manager_token():
-    token = monitor.token
-    if not token:
-        logger.error("❌ No hay token activo en el Manager.")
-    return token
-
-# =============================================================
-# OBTENER USER ID DESDE verify-token
-# =============================================================
-
-def get_user_id():
-    token = get_manager_token()
-    if not token:
-        return None
-
-    try:
-        data = roble.verify_token(token)
-        user = data.get("user", {})
-        return user.get("sub")
-    except Exception as e:
-        logger.error(f"Error get_user_id(): {e}")
-        return None
-
-
 # =============================================================
 # CREAR PROYECTO
 # =============================================================
 
 @proyectos_blueprint.route("/create", methods=["POST"])
-def crear_proyecto():
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
+@auth_required_async
+async def crear_proyecto():
+    token = request.token
 
     data = request.get_json()
     nombre = data.get("nombre")
@@ -63,12 +40,12 @@ def crear_proyecto():
     if not nombre or not rep_url:
         return jsonify({"error": "Faltan campos requeridos"}), 400
 
-    user_id = get_user_id()
-    if not user_id:
-        return jsonify({"error": "No se pudo obtener user_id"}), 401
+    # Escritura: primero el token verificado
+    session = await request.auth
+    user_id = session.user_id
 
     try:
-        proyecto = roble.create_project(
+        proyecto = await aroble.create_project(
             user_id=user_id,
             name=nombre,
             rep_url=rep_url,
@@ -86,23 +63,21 @@ def crear_proyecto():
 # =============================================================
 
 @proyectos_blueprint.route("/mine", methods=["GET"])
-def mis_proyectos():
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
-
-    user_id = get_user_id()
-    if not user_id:
-        return jsonify({"error": "Token inválido"}), 401
+@auth_required_async
+async def mis_proyectos():
+    token = request.token
 
     try:
-        proyectos = roble.read_records(
-            "proyectos",
-            filters={"user_id": user_id},
-            access_token=token
+        # Verificación del token y lectura de la tabla a la vez
+        session, index = await asyncio.gather(
+            request.auth,
+            aroble.read_index("proyectos", access_token=token)
         )
+        proyectos = index.lookup({"user_id": session.user_id})
         return jsonify({"projects": proyectos}), 200
 
+    except TokenInvalido:
+        raise
     except Exception as e:
         logger.error(f"❌ Error obteniendo proyectos: {e}")
         return jsonify({"error": "No se pudieron obtener los proyectos"}), 500
@@ -113,20 +88,27 @@ def mis_proyectos():
 # =============================================================
 
 @proyectos_blueprint.route("/<project_id>", methods=["GET"])
-def get_project(project_id):
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
+@auth_required_async
+async def get_project(project_id):
+    token = request.token
 
     try:
-        rows = roble.read_records("proyectos", access_token=token)
-        match = [p for p in rows if p.get("_id") == project_id]
+        _, match = await asyncio.gather(
+            request.auth,
+            aroble.read_records(
+                "proyectos",
+                filters={"_id": project_id},
+                access_token=token
+            )
+        )
 
         if not match:
             return jsonify({"error": "Proyecto no encontrado"}), 404
 
         return jsonify({"project": match[0]}), 200
 
+    except TokenInvalido:
+        raise
     except Exception as e:
         logger.error(f"❌ Error leyendo proyecto: {e}")
         return jsonify({"error": "No se pudo obtener el proyecto"}), 500
@@ -136,9 +118,18 @@ def get_project(project_id):
 # OBTENER CONTENEDOR ASOCIADO
 # =============================================================
 
-def get_container(project_id, token):
-    rows = roble.read_records("containers", access_token=token)
-    match = [c for c in rows if c.get("project_id") == project_id]
+async def get_container(project_id, token):
+    """
+    Contenedor del proyecto, leído a la vez que se verifica el token.
+    """
+    _, match = await asyncio.gather(
+        request.auth,
+        aroble.read_records(
+            "containers",
+            filters={"project_id": project_id},
+            access_token=token
+        )
+    )
     return match[0] if match else None
 
 
@@ -147,19 +138,19 @@ def get_container(project_id, token):
 # =============================================================
 
 @proyectos_blueprint.route("/start/<project_id>", methods=["POST"])
-def start_container(project_id):
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
+@auth_required_async
+async def start_container(project_id):
+    token = request.token
 
-    container = get_container(project_id, token)
+    container = await get_container(project_id, token)
     if not container:
         return jsonify({"error": "Contenedor no encontrado"}), 404
 
     cid = container["container_id"]
+    hibernation.forget(f"project_{project_id}".lower())
 
     try:
-        subprocess.check_call(["docker", "start", cid])
+        await asyncio.to_thread(runtime.start, cid)
         return jsonify({"success": True, "message": "Contenedor iniciado"}), 200
     except Exception as e:
         return jsonify({"error": f"Error iniciando contenedor: {e}"}), 500
@@ -170,19 +161,21 @@ def start_container(project_id):
 # =============================================================
 
 @proyectos_blueprint.route("/stop/<project_id>", methods=["POST"])
-def stop_container(project_id):
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
+@auth_required_async
+async def stop_container(project_id):
+    token = request.token
 
-    container = get_container(project_id, token)
+    container = await get_container(project_id, token)
     if not container:
         return jsonify({"error": "Contenedor no encontrado"}), 404
 
     cid = container["container_id"]
 
+    # Detenido por su dueño: el tráfico no debe volver a arrancarlo
+    hibernation.forget(f"project_{project_id}".lower())
+
     try:
-        subprocess.check_call(["docker", "stop", cid])
+        await asyncio.to_thread(runtime.stop, cid)
         return jsonify({"success": True, "message": "Contenedor detenido"}), 200
     except Exception as e:
         return jsonify({"error": f"Error deteniendo contenedor: {e}"}), 500
@@ -193,40 +186,84 @@ def stop_container(project_id):
 # =============================================================
 
 @proyectos_blueprint.route("/logs/<project_id>", methods=["GET"])
-def logs_container(project_id):
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
+@auth_required_async
+async def logs_container(project_id):
+    token = request.token
 
-    container = get_container(project_id, token)
+    container = await get_container(project_id, token)
     if not container:
         return jsonify({"error": "Contenedor no encontrado"}), 404
 
     cid = container["container_id"]
 
+    # Respuesta JSON acotada: por defecto las últimas DEFAULT_TAIL líneas
+    # y nunca más de MAX_TAIL (el historial completo va por /stream)
+    try:
+        params = parse_log_params(request.args, default_tail=DEFAULT_TAIL, max_tail=MAX_TAIL)
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {e}"}), 400
+    params["follow"] = False
+
     try:
-        logs = subprocess.check_output(["docker", "logs", cid], text=True)
+        logs = (await asyncio.to_thread(runtime.logs, cid, **params)).decode("utf-8", errors="replace")
         return jsonify({"success": True, "logs": logs}), 200
     except Exception as e:
         return jsonify({"error": f"No se pudieron obtener logs: {e}"}), 500
 
 
+@proyectos_blueprint.route("/logs/<project_id>/stream", methods=["GET"])
+@auth_required_async
+async def logs_container_stream(project_id):
+    """
+    Logs en streaming con memoria acotada.
+    Query params: tail, since, until, follow y format=sse|text
+    (por defecto sse si el cliente acepta text/event-stream).
+    """
+    token = request.token
+
+    container = await get_container(project_id, token)
+    if not container:
+        return jsonify({"error": "Contenedor no encontrado"}), 404
+
+    cid = container["container_id"]
+
+    try:
+        params = parse_log_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {e}"}), 400
+
+    fmt = request.args.get("format")
+    if not fmt:
+        accept = request.headers.get("Accept", "")
+        fmt = "sse" if "text/event-stream" in accept else "text"
+
+    try:
+        stream = runtime.logs(cid, stream=True, **params)
+    except Exception as e:
+        return jsonify({"error": f"No se pudieron obtener logs: {e}"}), 500
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    if fmt == "sse":
+        return Response(iter_sse(stream), mimetype="text/event-stream", headers=headers)
+    return Response(iter_text(stream), mimetype="text/plain", headers=headers)
+
+
 # =============================================================
 # DELETE PROJECT (ELIMINA CONTENEDOR + HOST + ROBLE)
 # =============================================================
 
 @proyectos_blueprint.route("/delete/<project_id>", methods=["DELETE"])
-def delete_project(project_id):
-    token = get_manager_token()
-    if not token:
-        return jsonify({"error": "Token requerido"}), 401
-
-    user_id = get_user_id()
-    if not user_id:
-        return jsonify({"error": "Token inválido"}), 401
+@auth_required_async
+async def delete_project(project_id):
+    token = request.token
 
-    # Obtener proyecto
-    registros = roble.read_records("proyectos", filters={"_id": project_id}, access_token=token)
+    # Obtener proyecto (a la vez que se verifica el token)
+    session, registros = await asyncio.gather(
+        request.auth,
+        aroble.read_records("proyectos", filters={"_id": project_id}, access_token=token)
+    )
+    user_id = session.user_id
 
     if not registros:
         return jsonify({"error": "Proyecto no encontrado"}), 404
@@ -240,24 +277,289 @@ def delete_project(project_id):
     container_id = proyecto.get("container_id")
     if container_id:
         try:
-            subprocess.call(["docker", "rm", "-f", container_id])
+            await asyncio.to_thread(runtime.remove, container_id, force=True)
         except Exception as e:
             logger.error(f"❌ Error eliminando contenedor: {e}")
 
     # ============== ELIMINAR HOST DEL NGINX PROXY ==============
-    host = proyecto.get("host")
-    if host:
-        try:
-            os.system(f"rm -f /etc/nginx/conf.d/{host}.conf")
-            os.system("nginx -s reload")
-        except Exception as e:
-            logger.error(f"❌ Error eliminando host del proxy: {e}")
+    try:
+        upstream = f"http://project_{project_id}:3000".lower()
+        hosts = {h for h, u in route_registry.routes().items() if u == upstream}
+
+        host = proyecto.get("host")
+        if host:
+            hosts.add(host)
+            route_registry.remove(host)
+
+        # Cualquier otro host que apunte al contenedor del proyecto
+        route_registry.remove_upstream(upstream)
+        access_log.forget(hosts)
+    except Exception as e:
+        logger.error(f"❌ Error eliminando host del proxy: {e}")
 
     # ============== ELIMINAR REGISTRO EN ROBLE ==============
     try:
-        roble.delete_record("proyectos", project_id, access_token=token)
+        await aroble.delete_record("proyectos", project_id, access_token=token)
     except Exception as e:
         logger.error(f"❌ Error eliminando en Roble: {e}")
         return jsonify({"error": "No se pudo eliminar en Roble"}), 500
 
+    deploy_timelines.forget(project_id)
+    hibernation.forget(f"project_{project_id}".lower())
+
     return jsonify({"success": True}), 200
+
+
+# =============================================================
+# DESPLEGAR PROYECTO (ASÍNCRONO)
+# =============================================================
+
+@proyectos_blueprint.route("/deploy/<project_id>", methods=["POST"])
+@auth_required_async
+async def deploy_project(project_id):
+    """
+    Encola el despliegue y responde 202 con el job de inmediato.
+    El progreso se consulta en /projects/jobs/<job_id>.
+    """
+    token = request.token
+
+    session, registros = await asyncio.gather(
+        request.auth,
+        aroble.read_records("proyectos", filters={"_id": project_id}, access_token=token)
+    )
+    user = session.user
+    user_id = session.user_id
+
+    if not registros:
+        return jsonify({"error": "Proyecto no encontrado"}), 404
+
+    proyecto = registros[0]
+    if proyecto["user_id"] != user_id:
+        return jsonify({"error": "No autorizado"}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validar_ref(data.get("ref"))
+    except RefInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    username = (
+        data.get("username")
+        or (user.get("email") or "").split("@")[0]
+        or user_id
+    )
+
+    job = deploy_queue.submit(
+        project_id=project_id,
+        repo_url=proyecto["rep_url"],
+        token=token,
+        nombre=proyecto["name"],
+        username=username,
+        user_id=user_id,
+        ref=data.get("ref")
+    )
+
+    return jsonify({"success": True, "job": job.to_dict()}), 202
+
+
+# =============================================================
+# ESTADO DE LOS DESPLIEGUES
+# =============================================================
+
+@proyectos_blueprint.route("/jobs", methods=["GET"])
+@auth_required
+def list_jobs():
+    """
+    Jobs del usuario. ?active=1 devuelve solo los que están en cola o
+    ejecutándose.
+    """
+    user_id = request.user_id
+
+    active = request.args.get("active") in ("1", "true", "yes")
+    jobs = deploy_queue.list(active_only=active, user_id=user_id)
+
+    return jsonify({"jobs": [j.to_dict() for j in jobs]}), 200
+
+
+@proyectos_blueprint.route("/jobs/<job_id>", methods=["GET"])
+@auth_required
+def get_job(job_id):
+    user_id = request.user_id
+
+    job = deploy_queue.get(job_id)
+    if not job or job.user_id != user_id:
+        return jsonify({"error": "Job no encontrado"}), 404
+
+    return jsonify({"job": job.to_dict()}), 200
+
+
+# =============================================================
+# HISTORIAL DE DESPLIEGUES (TIMELINE POR ETAPA)
+# =============================================================
+
+async def _proyecto_propio(project_id, token):
+    """
+    Devuelve (proyecto, None) o (None, respuesta_de_error).
+    """
+    session, registros = await asyncio.gather(
+        request.auth,
+        aroble.read_records("proyectos", filters={"_id": project_id}, access_token=token)
+    )
+
+    if not registros:
+        return None, (jsonify({"error": "Proyecto no encontrado"}), 404)
+    if registros[0]["user_id"] != session.user_id:
+        return None, (jsonify({"error": "No autorizado"}), 403)
+    return registros[0], None
+
+
+@proyectos_blueprint.route("/<project_id>/deploys", methods=["GET"])
+@auth_required_async
+async def list_deploys(project_id):
+    """
+    Últimos despliegues del proyecto (más reciente primero) con la
+    duración y detalles de cada etapa, y un resumen por etapa (último,
+    mediana y máximo) para comparar. ?limit=N acota la lista.
+    """
+    _, error = await _proyecto_propio(project_id, request.token)
+    if error:
+        return error
+
+    try:
+        limit = int(request.args.get("limit", 0))
+        if limit < 0:
+            raise ValueError(limit)
+        limit = limit or None
+    except ValueError:
+        return jsonify({"error": "limit inválido"}), 400
+
+    return jsonify({
+        "deploys": deploy_timelines.list(project_id, limit),
+        "summary": deploy_timelines.summary(project_id),
+    }), 200
+
+
+@proyectos_blueprint.route("/<project_id>/deploys/<deploy_id>", methods=["GET"])
+@auth_required_async
+async def get_deploy(project_id, deploy_id):
+    _, error = await _proyecto_propio(project_id, request.token)
+    if error:
+        return error
+
+    timeline = deploy_timelines.get(project_id, deploy_id)
+    if not timeline:
+        return jsonify({"error": "Despliegue no encontrado"}), 404
+
+    return jsonify({"deploy": timeline}), 200
+
+
+# =============================================================
+# REDEPLOY MASIVO
+# =============================================================
+
+# Usuarios (sub o email) que pueden redeployar proyectos de otros
+ADMIN_USERS = {
+    u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()
+}
+
+
+def _es_admin(session) -> bool:
+    return session.user_id in ADMIN_USERS or session.user.get("email") in ADMIN_USERS
+
+
+@proyectos_blueprint.route("/redeploy", methods=["POST"])
+@auth_required_async
+async def bulk_redeploy():
+    """
+    Body: {"user_id", "template", "status", "concurrency", "ref", "username"}.
+    Sin privilegios de admin solo se seleccionan proyectos propios.
+    Responde 202 con el progreso inicial; seguir en /projects/redeploy/<id>.
+    """
+    token = request.token
+    data = request.get_json(silent=True) or {}
+
+    try:
+        validar_ref(data.get("ref"))
+    except RefInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    session, index = await asyncio.gather(
+        request.auth,
+        aroble.read_index("proyectos", access_token=token)
+    )
+
+    user_id = data.get("user_id")
+    if not _es_admin(session):
+        if user_id and user_id != session.user_id:
+            return jsonify({"error": "No autorizado"}), 403
+        user_id = session.user_id
+
+    selector = {
+        "user_id": user_id,
+        "template": data.get("template"),
+        "status": data.get("status"),
+    }
+    if not any(selector.values()):
+        return jsonify({"error": "Se requiere al menos un criterio de selección"}), 400
+
+    proyectos = seleccionar(index.lookup(None), **selector)
+    if not proyectos:
+        return jsonify({"error": "Ningún proyecto coincide con el selector"}), 404
+
+    propio = (
+        data.get("username")
+        or (session.user.get("email") or "").split("@")[0]
+        or session.user_id
+    )
+
+    rutas = route_registry.routes()
+
+    def destino(proyecto):
+        # Mantener el subdominio actual (nombre.usuario.localhost): el
+        # host que el proxy ya enruta al contenedor del proyecto
+        upstream = f"http://project_{proyecto['_id']}:3000".lower()
+        hosts = [h for h, u in rutas.items() if u == upstream]
+        if proyecto.get("host") in hosts:
+            hosts = [proyecto["host"]]
+        for host in reversed(hosts):
+            parts = host.rsplit(".", 2)
+            if len(parts) == 3 and parts[2] == "localhost":
+                return parts[0], parts[1]
+        # Sin ruta: solo los proyectos propios tienen un usuario conocido
+        if proyecto.get("user_id") == session.user_id:
+            return proyecto["name"], propio
+        return None
+
+    try:
+        concurrency = int(data["concurrency"]) if data.get("concurrency") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency inválido"}), 400
+
+    bulk = bulk_redeploys.start(
+        proyectos,
+        token=token,
+        selector=selector,
+        destino=destino,
+        concurrency=concurrency,
+        ref=data.get("ref"),
+        user_id=session.user_id
+    )
+
+    return jsonify({"success": True, "redeploy": bulk.to_dict()}), 202
+
+
+@proyectos_blueprint.route("/redeploy", methods=["GET"])
+@auth_required
+def list_bulk_redeploys():
+    bulks = bulk_redeploys.list(user_id=request.user_id)
+    return jsonify({"redeploys": [b.to_dict(include_items=False) for b in bulks]}), 200
+
+
+@proyectos_blueprint.route("/redeploy/<bulk_id>", methods=["GET"])
+@auth_required
+def get_bulk_redeploy(bulk_id):
+    bulk = bulk_redeploys.get(bulk_id)
+    if not bulk or bulk.user_id != request.user_id:
+        return jsonify({"error": "Redeploy no encontrado"}), 404
+
+    return jsonify({"redeploy": bulk.to_dict()}), 200
@@ -0,0 +1,95 @@
+"""
+Variante asyncio de RobleClient, con la misma API.
+
+Cada llamada corre la versión bloqueante en un hilo (asyncio.to_thread),
+así que comparte con el cliente síncrono el pool keep-alive, los
+reintentos, los timeouts y las cachés de tokens y tablas. Lo que se gana
+es poder lanzar llamadas independientes a la vez desde una vista async:
+
+    session, index = await asyncio.gather(
+        request.auth,
+        aroble.read_index("proyectos", access_token=token),
+    )
+
+Flask ejecuta cada vista async en su propio event loop; un cliente con
+conexiones atadas al loop (aiohttp/httpx) perdería el pool en cada
+petición, por eso se reutiliza el de requests.
+
+Los aciertos de caché se resuelven sin saltar a un hilo.
+"""
+
+import asyncio
+
+from roble_client import RobleClient
+from token_cache import token_cache
+from table_cache import table_cache
+
+
+class AsyncRobleClient:
+
+    def __init__(self, client: RobleClient = None):
+        self.client = client or RobleClient()
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+    # ============================================================
+    # AUTH
+    # ============================================================
+
+    async def signup_direct(self, email, password, name):
+        return await self._run(self.client.signup_direct, email, password, name)
+
+    async def verify_code(self, email, code):
+        return await self._run(self.client.verify_code, email, code)
+
+    async def login(self, email, password):
+        return await self._run(self.client.login, email, password)
+
+    async def logout(self, token):
+        return await self._run(self.client.logout, token)
+
+    async def refresh_token(self, refresh_token):
+        return await self._run(self.client.refresh_token, refresh_token)
+
+    async def verify_token(self, token):
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+        return await self._run(self.client.verify_token, token)
+
+    # ============================================================
+    # LECTURAS
+    # ============================================================
+
+    async def read_records(self, table_name, filters=None, access_token=None):
+        index = await self.read_index(table_name, access_token)
+        return index.lookup(filters)
+
+    async def read_index(self, table_name, access_token=None):
+        index = table_cache.get(table_name, access_token)
+        if index is not None:
+            return index
+        return await self._run(self.client._fetch_table, table_name, access_token)
+
+    # ============================================================
+    # ESCRITURAS
+    # ============================================================
+
+    async def create_project(self, user_id, name, rep_url, access_token):
+        return await self._run(
+            self.client.create_project, user_id, name, rep_url, access_token
+        )
+
+    async def update_record(self, table_name, record_id, new_values, access_token):
+        return await self._run(
+            self.client.update_record, table_name, record_id, new_values, access_token
+        )
+
+    async def delete_record(self, table_name, record_id, access_token=None):
+        return await self._run(
+            self.client.delete_record, table_name, record_id, access_token
+        )
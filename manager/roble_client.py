@@ -1,6 +1,14 @@
 import requests
 import os
+import time
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from token_cache import token_cache
+from table_cache import table_cache
+from table_index import TableIndex
+from metrics import roble_latency, roble_errors
 
 
 class RobleClient:
@@ -9,17 +17,102 @@ class RobleClient:
         self.BASE = os.getenv("ROBLE_URL", "https://roble-api.openlab.uninorte.edu.co")
         self.CONTRACT = os.getenv("ROBLE_CONTRACT", "pc2_394e10a6d2")
 
+        # Tamaño del pool de conexiones keep-alive hacia Roble
+        self.pool_size = int(os.getenv("ROBLE_POOL_SIZE", "10"))
+
+        # Reintentos (solo lecturas idempotentes) y backoff entre intentos
+        self.retries = int(os.getenv("ROBLE_RETRIES", "2"))
+        self.backoff = float(os.getenv("ROBLE_BACKOFF", "0.3"))
+
+        # Timeouts (conexión, lectura) por tipo de operación
+        connect = float(os.getenv("ROBLE_CONNECT_TIMEOUT", "3"))
+        self.timeouts = {
+            "auth": (connect, float(os.getenv("ROBLE_AUTH_TIMEOUT", "10"))),
+            "read": (connect, float(os.getenv("ROBLE_READ_TIMEOUT", "15"))),
+            "write": (connect, float(os.getenv("ROBLE_WRITE_TIMEOUT", "15"))),
+        }
+
+        self.session = self._crear_sesion()
+
+    # ============================================================
+    # SESIÓN HTTP (pool keep-alive compartido)
+    # ============================================================
+
+    def _crear_sesion(self):
+        """
+        Crea una sesión con un pool de conexiones reutilizables.
+        El pool de urllib3 es thread-safe, así que la misma sesión
+        se comparte entre todos los hilos de gunicorn/Flask.
+        """
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            # Solo se reintentan lecturas; un POST/PATCH/DELETE repetido
+            # podría duplicar registros en Roble.
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, operacion, method, url, **kwargs):
+        """
+        Petición HTTP a Roble medida por operación (latencia y errores).
+        """
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except Exception:
+            roble_errors.inc(operacion)
+            raise
+        finally:
+            roble_latency.observe(operacion, value=time.perf_counter() - start)
+
+        if resp.status_code >= 400:
+            roble_errors.inc(operacion)
+        return resp
+
     # ============================================================
     # AUTH: SIGNUP
     # ============================================================
 
     def signup_direct(self, email, password, name):
         url = f"{self.BASE}/auth/{self.CONTRACT}/signup-direct"
-        resp = requests.post(url, json={
+        resp = self._request("signup_direct", "POST", url, json={
             "email": email,
             "password": password,
             "name": name
-        })
+        }, timeout=self.timeouts["auth"])
+        resp.raise_for_status()
+        return resp.json()
+
+    # ============================================================
+    # VERIFY EMAIL (código enviado al correo)
+    # ============================================================
+
+    def verify_code(self, email, code):
+        url = f"{self.BASE}/auth/{self.CONTRACT}/verify-email"
+        resp = self._request(
+            "verify_code", "POST", url,
+            json={"email": email, "code": code},
+            timeout=self.timeouts["auth"]
+        )
         resp.raise_for_status()
         return resp.json()
 
@@ -29,7 +122,38 @@ class RobleClient:
 
     def login(self, email, password):
         url = f"{self.BASE}/auth/{self.CONTRACT}/login"
-        resp = requests.post(url, json={"email": email, "password": password})
+        resp = self._request(
+            "login", "POST", url,
+            json={"email": email, "password": password},
+            timeout=self.timeouts["auth"]
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    # ============================================================
+    # LOGOUT
+    # ============================================================
+
+    def logout(self, token):
+        url = f"{self.BASE}/auth/{self.CONTRACT}/logout"
+        resp = self._request(
+            "logout", "POST", url,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=self.timeouts["auth"]
+        )
+        resp.raise_for_status()
+
+    # ============================================================
+    # REFRESH TOKEN
+    # ============================================================
+
+    def refresh_token(self, refresh_token):
+        url = f"{self.BASE}/auth/{self.CONTRACT}/refresh-token"
+        resp = self._request(
+            "refresh_token", "POST", url,
+            json={"refreshToken": refresh_token},
+            timeout=self.timeouts["auth"]
+        )
         resp.raise_for_status()
         return resp.json()
 
@@ -38,41 +162,73 @@ class RobleClient:
     # ============================================================
 
     def verify_token(self, token):
+        # Resultado reciente en caché → sin ida y vuelta a Roble
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+
         url = f"{self.BASE}/auth/{self.CONTRACT}/verify-token"
-        resp = requests.get(url, headers={"Authorization": f"Bearer {token}"})
+        resp = self._request(
+            "verify_token", "GET", url,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=self.timeouts["auth"]
+        )
         resp.raise_for_status()
-        return resp.json()
+
+        data = resp.json()
+        token_cache.set(token, data)
+        return data
 
     # ============================================================
     # READ TABLE (Roble does NOT support filters in the request)
     # ============================================================
 
     def read_records(self, table_name, filters=None, access_token=None):
+        # Filtrado manual (Roble siempre devuelve la tabla completa),
+        # resuelto con los índices por _id / user_id / project_id
+        return self.read_index(table_name, access_token).lookup(filters)
+
+    def read_index(self, table_name, access_token=None):
+        """
+        Índice de la tabla completa (desde la caché o descargándola).
+        Permite leer la tabla antes de saber por qué campo se va a filtrar.
+        """
+        index = table_cache.get(table_name, access_token)
+
+        if index is None:
+            index = self._fetch_table(table_name, access_token)
+
+        return index
+
+    def _fetch_table(self, table_name, access_token=None):
+        """
+        Descarga la tabla completa de Roble, la deja en caché y devuelve
+        su índice.
+        """
         url = f"{self.BASE}/database/{self.CONTRACT}/read"
 
         headers = {}
         if access_token:
             headers["Authorization"] = f"Bearer {access_token}"
 
-        resp = requests.get(url, headers=headers, params={"tableName": table_name})
+        version = table_cache.version(table_name, access_token)
+
+        resp = self._request(
+            "read_records", "GET", url,
+            headers=headers,
+            params={"tableName": table_name},
+            timeout=self.timeouts["read"]
+        )
         resp.raise_for_status()
 
         data = resp.json()
 
-        # Filtrado manual (Roble siempre devuelve la tabla completa)
-        if filters:
-            filtered = []
-            for row in data:
-                match = True
-                for k, v in filters.items():
-                    if row.get(k) != v:
-                        match = False
-                        break
-                if match:
-                    filtered.append(row)
-            return filtered
-
-        return data
+        # Si una escritura local ganó la carrera, la copia no se cachea
+        # pero se indexa igual para responder esta petición.
+        return (
+            table_cache.put(table_name, data, expected_version=version, access_token=access_token)
+            or TableIndex(data)
+        )
 
     # ============================================================
     # INSERT RECORD (usado para crear proyecto)
@@ -96,7 +252,7 @@ class RobleClient:
             }]
         }
 
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = self._request("create_project", "POST", url, headers=headers, json=payload, timeout=self.timeouts["write"])
         resp.raise_for_status()
 
         data = resp.json()
@@ -104,7 +260,10 @@ class RobleClient:
         if not data.get("inserted"):
             raise Exception(f"Error insertando proyecto en Roble: {data}")
 
-        return data["inserted"][0]
+        proyecto = data["inserted"][0]
+        table_cache.insert("proyectos", proyecto, access_token)
+
+        return proyecto
 
     # ============================================================
     # UPDATE RECORD
@@ -121,9 +280,11 @@ class RobleClient:
             "newValues": new_values
         }
 
-        resp = requests.patch(url, headers=headers, json=payload)
+        resp = self._request("update_record", "PATCH", url, headers=headers, json=payload, timeout=self.timeouts["write"])
         resp.raise_for_status()
 
+        table_cache.update(table_name, record_id, new_values)
+
         return resp.json()
 
     # ============================================================
@@ -143,7 +304,9 @@ class RobleClient:
             "idValue": record_id
         }
 
-        resp = requests.delete(url, headers=headers, json=payload)
+        resp = self._request("delete_record", "DELETE", url, headers=headers, json=payload, timeout=self.timeouts["write"])
         resp.raise_for_status()
 
+        table_cache.delete(table_name, record_id)
+
         return resp.json()
@@ -0,0 +1,95 @@
+"""
+Registro de sesiones por usuario.
+
+Reemplaza al token global del Monitor: cada petición trae su propio
+Bearer token y aquí se guarda la sesión resuelta (usuario verificado) de
+cada uno. Las sesiones se reparten en SESSION_SHARDS fragmentos, cada uno
+con su propio lock (lock striping), para que usuarios distintos no se
+bloqueen entre sí; cada fragmento es un LRU acotado.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class Session:
+
+    def __init__(self, token: str, user: dict):
+        self.token = token
+        self.user = user or {}
+        self.user_id = self.user.get("sub")
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "email": self.user.get("email"),
+            "created_at": self.created_at,
+            "last_seen": self.last_seen,
+        }
+
+
+class _Shard:
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class SessionStore:
+
+    def __init__(self):
+        self.shard_count = int(os.getenv("SESSION_SHARDS", "16"))
+        self.max_size = int(os.getenv("SESSION_MAX", "10000"))
+
+        self._per_shard = max(1, -(-self.max_size // self.shard_count))
+        self._shards = [_Shard() for _ in range(self.shard_count)]
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[int(key[:8], 16) % self.shard_count]
+
+    def put(self, token: str, user: dict) -> Session:
+        key = self._key(token)
+        shard = self._shard(key)
+        session = Session(token, user)
+
+        with shard.lock:
+            shard.data[key] = session
+            shard.data.move_to_end(key)
+            while len(shard.data) > self._per_shard:
+                shard.data.popitem(last=False)
+
+        return session
+
+    def get(self, token: str):
+        key = self._key(token)
+        shard = self._shard(key)
+
+        with shard.lock:
+            session = shard.data.get(key)
+            if session is not None:
+                session.last_seen = time.time()
+                shard.data.move_to_end(key)
+            return session
+
+    def remove(self, token: str):
+        key = self._key(token)
+        shard = self._shard(key)
+
+        with shard.lock:
+            shard.data.pop(key, None)
+
+    def __len__(self):
+        return sum(len(s.data) for s in self._shards)
+
+
+# Instancia global
+sessions = SessionStore()
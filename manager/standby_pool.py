@@ -0,0 +1,358 @@
+"""
+Pool de contenedores en espera por template.
+
+Crear y arrancar un contenedor nuevo (y antes construir su imagen) es la
+parte más lenta del primer despliegue de un proyecto. Para los templates
+cuyo código no necesita compilarse el Manager mantiene STANDBY_POOL_SIZE
+contenedores ya creados y detenidos, en la red de los proyectos y con
+los límites de recursos estándar:
+
+    pool_<template>_<id>   (labels hosting.pool=<template>,
+                            hosting.pool-spec=<hash>, estado "created")
+
+Si el repo de un despliegue trae el Dockerfile del template sin cambios
+y los mismos manifiestos, el despliegue toma un contenedor del pool,
+copia el código del repo dentro, lo renombra a project_<id> y lo
+arranca, sin build ni `create`. Un hilo en segundo plano repone el pool.
+
+La receta del contenedor en espera sale del Dockerfile del template,
+partido en el primer `COPY . .` (ver base_images.py): la imagen es la
+base precalentada (o la imagen del FROM si la base no ejecuta nada), el
+destino del código es el WORKDIR y el comando, su CMD. Un template
+participa solo si después del `COPY . .` no hay más que EXPOSE y CMD;
+template_react, que compila con `npm run build`, queda fuera. El hash de
+la receta va en el label hosting.pool-spec: si el template cambia, los
+contenedores en espera viejos se descartan en lugar de usarse.
+
+Los templates con base precalentada quedan fuera si BASE_IMAGES_ENABLED=0.
+
+Docker no permite cambiar los labels de un contenedor, así que los
+activados conservan hosting.pool. Lo que distingue a uno en espera es
+que nunca se arrancó (estado "created").
+
+STANDBY_POOL_SIZE fija el tamaño por template (0 lo desactiva) y
+STANDBY_POOL_SIZE_<TEMPLATE> lo cambia para uno solo
+(p. ej. STANDBY_POOL_SIZE_FLASK=4).
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from collections import deque
+
+from container_runtime import (
+    runtime as default_runtime, ContainerRuntimeError, PROJECT_CPUS, PROJECT_MEMORY
+)
+from base_images import (
+    base_images, RECIPES, manifest_hash, normalizar_dockerfile, dividir_dockerfile
+)
+from metrics import cache_requests, standby_containers
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "hosting.pool"
+SPEC_LABEL = "hosting.pool-spec"
+POOL_PREFIX = "pool_"
+
+# Templates candidatos (los que no se pueden usar se descartan solos)
+TEMPLATES = ("flask", "static_template")
+
+
+def _cmd(value: str):
+    """
+    Argumentos de un CMD en forma exec (JSON) o shell.
+    """
+    if value.startswith("["):
+        try:
+            args = json.loads(value)
+        except ValueError:
+            return None
+        return args if isinstance(args, list) and all(isinstance(a, str) for a in args) else None
+    return ["/bin/sh", "-c", value]
+
+
+def receta(folder: str, template: str):
+    """
+    Receta del contenedor en espera a partir del Dockerfile del template:
+    {"dockerfile", "manifests", "hash", "image" (o None si es la base
+    precalentada), "dest", "command"}. None si el template no sirve
+    para el pool.
+    """
+    try:
+        with open(os.path.join(folder, "Dockerfile"), "rb") as f:
+            dockerfile = normalizar_dockerfile(f.read().decode("utf-8", errors="replace"))
+    except OSError:
+        return None
+
+    base, app = dividir_dockerfile(dockerfile)
+    if base is None:
+        return None
+
+    command = None
+    for line in app.strip().split("\n")[1:]:
+        op, _, rest = line.partition(" ")
+        op = op.upper()
+        if line == "COPY . ." or op == "EXPOSE":
+            continue
+        if op == "CMD":
+            command = _cmd(rest)
+            if command is None:
+                return None
+            continue
+        # RUN, FROM (multi-etapa), ENV...: necesita un build real
+        return None
+
+    base_lines = base.strip().split("\n")
+    workdirs = [l.split(" ", 1)[1] for l in base_lines if l.upper().startswith("WORKDIR ")]
+    if not workdirs or not workdirs[-1].startswith("/"):
+        return None
+
+    manifests = RECIPES.get(template, {}).get("manifests", [])
+    digest = manifest_hash(folder, manifests)
+    if digest is None:
+        return None
+
+    if template in RECIPES:
+        image = None
+    elif all(l.upper().startswith(("FROM ", "WORKDIR ")) for l in base_lines):
+        image = base_lines[0].split()[1]
+    else:
+        # La base ejecuta pasos pero no hay imagen precalentada para ella
+        return None
+
+    return {
+        "dockerfile": dockerfile,
+        "manifests": digest,
+        "hash": hashlib.sha256(f"{dockerfile}\0{digest}".encode("utf-8")).hexdigest()[:16],
+        "image": image,
+        "dest": workdirs[-1],
+        "command": command,
+    }
+
+
+class StandbyEntry:
+
+    def __init__(self, template: str, name: str, image: str, container_id: str,
+                 spec: str, dest: str):
+        self.template = template
+        self.name = name
+        self.image = image
+        self.container_id = container_id
+        self.spec = spec
+        self.dest = dest
+
+
+class StandbyPool:
+
+    def __init__(self, templates_dir: str = None, runtime=None):
+        self.templates_dir = templates_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "templates"
+        )
+        self.runtime = runtime or default_runtime
+        self.network = os.getenv("DOCKER_NETWORK", "hosting_net")
+        self.interval = float(os.getenv("STANDBY_POOL_INTERVAL", "30"))
+
+        default_size = int(os.getenv("STANDBY_POOL_SIZE", "2"))
+        self.sizes = {
+            t: int(os.getenv(f"STANDBY_POOL_SIZE_{t.upper()}", default_size))
+            if base_images.enabled or t not in RECIPES else 0
+            for t in TEMPLATES
+        }
+
+        # template -> deque de StandbyEntry listos para usar
+        self._available = {t: deque() for t in TEMPLATES}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(size > 0 for size in self.sizes.values())
+
+    def _receta(self, template: str):
+        return receta(os.path.join(self.templates_dir, template), template)
+
+    # ---------------------------------------------------------
+    # Despliegues
+    # ---------------------------------------------------------
+
+    def match(self, repo_path: str):
+        """
+        (template, receta) del pool cuyo Dockerfile y manifiestos
+        coinciden con los del repo, o (None, None).
+        """
+        try:
+            with open(os.path.join(repo_path, "Dockerfile"), "rb") as f:
+                dockerfile = normalizar_dockerfile(f.read().decode("utf-8", errors="replace"))
+        except OSError:
+            return None, None
+
+        for template in TEMPLATES:
+            spec = self._receta(template)
+            if spec is None or dockerfile != spec["dockerfile"]:
+                continue
+            manifests = RECIPES.get(template, {}).get("manifests", [])
+            if manifest_hash(repo_path, manifests) == spec["manifests"]:
+                return template, spec
+        return None, None
+
+    def claim(self, repo_path: str):
+        """
+        Toma un contenedor en espera para el repo, o None si el repo no
+        coincide con un template del pool o no quedan disponibles con la
+        receta actual del template.
+        """
+        if not self.enabled:
+            return None
+
+        template, spec = self.match(repo_path)
+        if template is None or not self.sizes[template]:
+            return None
+
+        entry = None
+        viejos = []
+        with self._lock:
+            queue = self._available[template]
+            while queue:
+                candidate = queue.popleft()
+                if candidate.spec == spec["hash"]:
+                    entry = candidate
+                    break
+                viejos.append(candidate)
+
+        self._descartar(viejos)
+        cache_requests.inc("standby_pool", "hit" if entry else "miss")
+        self._wake.set()
+
+        if entry is not None:
+            standby_containers.dec(template)
+        return entry
+
+    def activate(self, entry: StandbyEntry, container_name: str, repo_path: str) -> str:
+        """
+        Copia el código del repo en el contenedor en espera, lo renombra
+        a `container_name` (reemplazando el anterior) y lo arranca.
+        Devuelve el id del contenedor.
+        """
+        try:
+            self.runtime.copy_to(entry.name, repo_path, entry.dest)
+            self.runtime.remove(container_name, force=True)
+            self.runtime.rename(entry.name, container_name)
+            self.runtime.start(container_name)
+        except Exception:
+            # El contenedor quedó a medias (quizá ya renombrado): no vuelve al pool
+            self.runtime.remove(entry.container_id, force=True)
+            raise
+
+        logger.info(f"⚡ Contenedor en espera '{entry.name}' activado como '{container_name}'")
+        return entry.container_id
+
+    # ---------------------------------------------------------
+    # Reposición
+    # ---------------------------------------------------------
+
+    def _descartar(self, entries):
+        for entry in entries:
+            standby_containers.dec(entry.template)
+            logger.info(f"🧹 Descartando contenedor en espera viejo '{entry.name}'")
+            try:
+                self.runtime.remove(entry.container_id, force=True)
+            except ContainerRuntimeError as e:
+                logger.warning(f"⚠️ No se pudo eliminar '{entry.name}': {e}")
+
+    def _crear(self, template: str, spec: dict) -> StandbyEntry:
+        image = spec["image"] or base_images.ensure(template)
+        if image is None:
+            raise ContainerRuntimeError(f"sin imagen para '{template}'")
+
+        name = f"{POOL_PREFIX}{template}_{uuid.uuid4().hex[:8]}"
+        container_id = self.runtime.create(
+            image,
+            name=name,
+            network=self.network,
+            cpus=PROJECT_CPUS,
+            memory=PROJECT_MEMORY,
+            labels={POOL_LABEL: template, SPEC_LABEL: spec["hash"]},
+            command=spec["command"],
+        )
+        return StandbyEntry(template, name, image, container_id, spec["hash"], spec["dest"])
+
+    def refill(self):
+        """
+        Descarta los contenedores de recetas viejas y completa el pool de
+        cada template hasta su tamaño.
+        """
+        for template, size in self.sizes.items():
+            if not size:
+                continue
+
+            spec = self._receta(template)
+
+            with self._lock:
+                queue = self._available[template]
+                viejos = [e for e in queue if spec is None or e.spec != spec["hash"]]
+                for e in viejos:
+                    queue.remove(e)
+            self._descartar(viejos)
+
+            if spec is None:
+                continue
+
+            while True:
+                with self._lock:
+                    if len(self._available[template]) >= size:
+                        break
+                try:
+                    entry = self._crear(template, spec)
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo crear un contenedor en espera de '{template}': {e}")
+                    break
+
+                with self._lock:
+                    self._available[template].append(entry)
+                standby_containers.inc(template)
+
+    def _limpiar(self):
+        """
+        Elimina los contenedores en espera que dejó un arranque anterior
+        (pueden venir de una receta ya vieja). Solo los que nunca se
+        arrancaron: los activados ya son contenedores de proyectos.
+        """
+        for template in TEMPLATES:
+            try:
+                names = self.runtime.list_containers(POOL_LABEL, template, status="created")
+            except ContainerRuntimeError as e:
+                logger.warning(f"⚠️ No se pudo listar el pool de '{template}': {e}")
+                continue
+            for name in names:
+                self.runtime.remove(name, force=True)
+
+    def _loop(self):
+        self._limpiar()
+        while True:
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"❌ Error reponiendo el pool de contenedores: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """
+        Llena el pool en segundo plano (no retrasa el arranque).
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def available(self) -> dict:
+        with self._lock:
+            return {t: len(q) for t, q in self._available.items()}
+
+
+# Instancia global
+standby_pool = StandbyPool()
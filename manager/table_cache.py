@@ -0,0 +1,192 @@
+"""
+Caché en memoria de las tablas de Roble (read-through / write-through).
+
+Roble siempre devuelve la tabla completa en /read, así que guardamos una
+copia por tabla durante TABLE_CACHE_TTL segundos. Las escrituras que hace
+el propio Manager (insert, update, delete) se aplican directamente sobre
+la copia en vez de forzar una nueva descarga. Cada cambio incrementa la
+versión de la tabla, y el índice (TableIndex) se reconstruye una sola vez
+por versión, la primera vez que se consulta.
+
+Roble puede filtrar filas según el token, así que cada copia pertenece al
+token con el que se descargó (clave: tabla + hash SHA-256 del token) y
+solo se sirve a ese mismo token. Las copias son LRU, como mucho
+TABLE_CACHE_MAX_ENTRIES en total.
+"""
+
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from table_index import TableIndex
+from metrics import cache_requests
+
+
+def _scope(access_token) -> str:
+    if not access_token:
+        return "anon"
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+class TableCache:
+
+    def __init__(self):
+        self.ttl = float(os.getenv("TABLE_CACHE_TTL", "30"))
+        self.max_entries = int(os.getenv("TABLE_CACHE_MAX_ENTRIES", "256"))
+
+        # (table_name, scope) -> {"rows", "version", "fetched_at", "index"}
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contador global de versiones: nunca se repite aunque la tabla
+        # se invalide y se vuelva a cargar.
+        self._next_version = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def _bump(self, entry):
+        self._next_version += 1
+        entry["version"] = self._next_version
+        entry["index"] = None
+
+    def _entries(self, table_name: str):
+        """
+        Copias de la tabla de todos los tokens. Con el lock tomado.
+        """
+        return [e for (name, _), e in self._tables.items() if name == table_name]
+
+    # ---------------------------------------------------------
+    # Lectura
+    # ---------------------------------------------------------
+
+    def get(self, table_name: str, access_token: str = None):
+        """
+        Devuelve el TableIndex de la versión actual si la tabla está en
+        caché y vigente para ese token; None en caso contrario.
+        """
+        key = (table_name, _scope(access_token))
+
+        with self._lock:
+            entry = self._tables.get(key)
+
+            if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+                self.misses += 1
+                cache_requests.inc("table", "miss")
+                return None
+
+            self.hits += 1
+            cache_requests.inc("table", "hit")
+            self._tables.move_to_end(key)
+
+            if entry["index"] is None:
+                entry["index"] = TableIndex(entry["rows"], entry["version"])
+            return entry["index"]
+
+    def version(self, table_name: str, access_token: str = None):
+        with self._lock:
+            entry = self._tables.get((table_name, _scope(access_token)))
+            return entry["version"] if entry else None
+
+    def put(self, table_name: str, rows, expected_version=None, access_token: str = None):
+        """
+        Guarda la tabla descargada de Roble con ese token y devuelve su
+        TableIndex. Si durante la descarga hubo una escritura local (la
+        versión cambió), la descarga se descarta para no pisar datos más
+        recientes con una copia vieja, y se devuelve None.
+        """
+        key = (table_name, _scope(access_token))
+
+        with self._lock:
+            entry = self._tables.get(key)
+            current = entry["version"] if entry else None
+
+            if current != expected_version:
+                return None
+
+            entry = {"rows": list(rows), "fetched_at": time.time()}
+            self._bump(entry)
+            entry["index"] = TableIndex(entry["rows"], entry["version"])
+            self._tables[key] = entry
+            self._tables.move_to_end(key)
+
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+            return entry["index"]
+
+    # ---------------------------------------------------------
+    # Escritura (write-through)
+    # ---------------------------------------------------------
+
+    def insert(self, table_name: str, record: dict, access_token: str = None):
+        """
+        El registro nuevo se agrega a la copia del token que lo creó; las
+        copias de otros tokens se descartan (no se sabe si Roble se lo
+        mostraría a ellos).
+        """
+        scope = _scope(access_token)
+
+        with self._lock:
+            for key in [k for k in self._tables if k[0] == table_name]:
+                if key[1] != scope:
+                    del self._tables[key]
+                    continue
+
+                entry = self._tables[key]
+                entry["rows"] = entry["rows"] + [record]
+                self._bump(entry)
+
+    def update(self, table_name: str, record_id, new_values: dict):
+        # Solo cambia filas que cada copia ya tenía
+        with self._lock:
+            for entry in self._entries(table_name):
+                entry["rows"] = [
+                    {**row, **new_values} if row.get("_id") == record_id else row
+                    for row in entry["rows"]
+                ]
+                self._bump(entry)
+
+    def delete(self, table_name: str, record_id):
+        with self._lock:
+            for entry in self._entries(table_name):
+                entry["rows"] = [
+                    row for row in entry["rows"] if row.get("_id") != record_id
+                ]
+                self._bump(entry)
+
+    def invalidate(self, table_name: str = None):
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+            else:
+                for key in [k for k in self._tables if k[0] == table_name]:
+                    del self._tables[key]
+
+    # ---------------------------------------------------------
+    # Estadísticas
+    # ---------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            now = time.time()
+
+            tables = {}
+            for (name, _), entry in self._tables.items():
+                t = tables.setdefault(name, {"copies": 0, "rows": 0, "oldest_age": 0.0})
+                t["copies"] += 1
+                t["rows"] += len(entry["rows"])
+                t["oldest_age"] = max(t["oldest_age"], round(now - entry["fetched_at"], 3))
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "tables": tables,
+            }
+
+
+# Instancia global (compartida por todos los RobleClient del proceso)
+table_cache = TableCache()
@@ -0,0 +1,76 @@
+"""
+Índices hash en memoria sobre las filas de una tabla de Roble.
+
+Se construyen una sola vez por versión de la tabla (ver table_cache) y
+permiten buscar por `_id`, `user_id` o `project_id` en O(1) en lugar de
+recorrer todas las filas.
+"""
+
+INDEXED_KEYS = ("_id", "user_id", "project_id")
+
+
+class TableIndex:
+
+    def __init__(self, rows, version=None, keys=INDEXED_KEYS):
+        self.rows = list(rows)
+        self.version = version
+        self.keys = tuple(keys)
+
+        # key -> valor -> [filas]
+        self._indexes = {k: {} for k in self.keys}
+
+        for row in self.rows:
+            for k in self.keys:
+                # Filas sin la columna quedan bajo None, igual que row.get(k)
+                value = row.get(k)
+                try:
+                    self._indexes[k].setdefault(value, []).append(row)
+                except TypeError:
+                    # Valor no hasheable: esa fila solo se encuentra por scan
+                    continue
+
+    def lookup(self, filters=None):
+        """
+        Devuelve copias de las filas que cumplen TODOS los filtros
+        (igualdad exacta); las filas del índice se comparten entre
+        peticiones y no deben modificarse.
+
+        Si algún filtro usa una columna indexada se parte del bucket más
+        pequeño y solo se verifican los filtros restantes sobre él; si
+        ninguno está indexado se hace el recorrido lineal de siempre.
+        """
+        if not filters:
+            return [dict(row) for row in self.rows]
+
+        candidates = None
+        used_key = None
+
+        for k, v in filters.items():
+            if k not in self._indexes:
+                continue
+            try:
+                bucket = self._indexes[k].get(v, [])
+            except TypeError:
+                continue
+            if candidates is None or len(bucket) < len(candidates):
+                candidates = bucket
+                used_key = k
+            if not candidates:
+                return []
+
+        if candidates is None:
+            candidates = self.rows
+
+        rest = [(k, v) for k, v in filters.items() if k != used_key]
+
+        return [
+            dict(row) for row in candidates
+            if all(row.get(k) == v for k, v in rest)
+        ]
+
+    def get(self, key, value):
+        """
+        Atajo para la primera fila con `key == value` (o None).
+        """
+        match = self.lookup({key: value})
+        return match[0] if match else None
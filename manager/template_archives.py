@@ -0,0 +1,134 @@
+"""
+ZIPs de templates cacheados en disco.
+
+Cada template se comprime una sola vez por hash de contenido y se guarda
+en TEMPLATE_ARCHIVE_DIR como <folder>-<hash>.zip. Las descargas se sirven
+directamente desde ese archivo (send_file → sendfile, Range, ETag), sin
+volver a comprimir ni cargar el ZIP en memoria.
+
+Para no hashear todo el template en cada descarga, primero se compara una
+firma barata (rutas, tamaños, mtimes) como mucho cada
+TEMPLATE_SCAN_INTERVAL segundos; solo si cambia se recalcula el hash de
+contenido y, si este también cambió, el ZIP.
+"""
+
+import os
+import time
+import hashlib
+import zipfile
+import logging
+import tempfile
+import threading
+
+from template_catalog import SKIP_DIRS
+
+logger = logging.getLogger(__name__)
+
+
+def _iter_files(folder_path):
+    for root, dirs, files in os.walk(folder_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for file in sorted(files):
+            full_path = os.path.join(root, file)
+            yield full_path, os.path.relpath(full_path, folder_path)
+
+
+class TemplateArchives:
+
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or os.getenv(
+            "TEMPLATE_ARCHIVE_DIR", "/tmp/hosting_templates_zip"
+        )
+        self.scan_interval = float(os.getenv("TEMPLATE_SCAN_INTERVAL", "5"))
+
+        # folder -> {"signature", "hash", "path", "scanned_at"}
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _lock_for(self, folder: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(folder, threading.Lock())
+
+    @staticmethod
+    def _signature(folder_path: str) -> str:
+        h = hashlib.sha256()
+        for full_path, rel_path in _iter_files(folder_path):
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            h.update(f"{rel_path}\0{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def _content_hash(folder_path: str) -> str:
+        h = hashlib.sha256()
+        for full_path, rel_path in _iter_files(folder_path):
+            h.update(rel_path.encode("utf-8") + b"\0")
+            with open(full_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _build(self, folder: str, folder_path: str, content_hash: str) -> str:
+        target = os.path.join(self.archive_dir, f"{folder}-{content_hash[:16]}.zip")
+        if os.path.exists(target):
+            return target
+
+        logger.info(f"🗜️ Generando ZIP de '{folder}' ({content_hash[:12]})")
+
+        fd, tmp = tempfile.mkstemp(dir=self.archive_dir, suffix=".zip.tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with zipfile.ZipFile(raw, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                    for full_path, rel_path in _iter_files(folder_path):
+                        zip_file.write(full_path, rel_path)
+            os.replace(tmp, target)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        # Borrar versiones anteriores de este template
+        prefix = f"{folder}-"
+        for name in os.listdir(self.archive_dir):
+            path = os.path.join(self.archive_dir, name)
+            if name.startswith(prefix) and name.endswith(".zip") and path != target:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+        return target
+
+    def get(self, folder: str, folder_path: str):
+        """
+        Devuelve (ruta_zip, hash_contenido) actualizados para el template.
+        """
+        with self._lock_for(folder):
+            entry = self._entries.get(folder)
+            now = time.time()
+
+            if (entry and now - entry["scanned_at"] < self.scan_interval
+                    and os.path.exists(entry["path"])):
+                return entry["path"], entry["hash"]
+
+            signature = self._signature(folder_path)
+            if entry and entry["signature"] == signature and os.path.exists(entry["path"]):
+                entry["scanned_at"] = now
+                return entry["path"], entry["hash"]
+
+            content_hash = self._content_hash(folder_path)
+            path = self._build(folder, folder_path, content_hash)
+
+            self._entries[folder] = {
+                "signature": signature,
+                "hash": content_hash,
+                "path": path,
+                "scanned_at": now,
+            }
+            return path, content_hash
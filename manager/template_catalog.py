@@ -0,0 +1,141 @@
+"""
+Catálogo de templates precalculado.
+
+La respuesta de /api/templates se construye una sola vez: JSON ya
+serializado, su versión gzip y un ETag fuerte. Solo se reconstruye cuando
+un escaneo de mtimes (como mucho cada TEMPLATE_SCAN_INTERVAL segundos)
+detecta que algún archivo de los templates cambió.
+
+En la misma pasada se arma el índice de metadatos (ruta, tamaño y sha256
+de cada archivo) que usan el listado liviano y la descarga por archivo.
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+# Extensiones permitidas
+ALLOWED_EXT = {
+    ".html", ".js", ".css", ".json", ".py",
+    ".yml", ".yaml", ".md", ".txt"
+}
+
+# Directorios que nunca forman parte del catálogo
+SKIP_DIRS = {"node_modules", ".git", "__pycache__"}
+
+
+def iter_template_files(base_path):
+    """
+    Recorre los archivos del template con extensión permitida.
+    Devuelve (ruta_absoluta, ruta_relativa) en orden estable.
+    """
+    for root, dirs, files in os.walk(base_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+
+        for file in sorted(files):
+            ext = os.path.splitext(file)[1].lower()
+            if ext not in ALLOWED_EXT:
+                continue
+
+            full_path = os.path.join(root, file)
+            yield full_path, os.path.relpath(full_path, base_path)
+
+
+class CatalogPayload:
+
+    def __init__(self, data: dict, files: dict = None):
+        self.data = data
+
+        # folder -> rel_path -> {"path", "size", "sha256"}
+        self.files = files or {}
+
+        self.identity = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.gzip = gzip.compress(self.identity, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(self.identity).hexdigest()[:32]
+        # Cada codificación es una representación distinta: su propio ETag
+        self.etag_gzip = self.etag + "-gz"
+
+
+class TemplateCatalog:
+
+    def __init__(self, templates_dir: str, template_map: dict):
+        self.templates_dir = templates_dir
+        self.template_map = template_map
+        self.scan_interval = float(os.getenv("TEMPLATE_SCAN_INTERVAL", "5"))
+
+        self._lock = threading.Lock()
+        self._signature = None
+        self._payload = None
+        self._last_scan = 0.0
+
+        self.builds = 0
+
+    def _folders(self):
+        for folder_name, pretty_name in self.template_map.items():
+            folder_path = os.path.join(self.templates_dir, folder_name)
+            if os.path.isdir(folder_path):
+                yield folder_name, pretty_name, folder_path
+
+    def _scan(self) -> str:
+        """
+        Firma barata del estado de los templates (rutas, tamaños, mtimes).
+        """
+        h = hashlib.sha256()
+        for folder_name, _, folder_path in self._folders():
+            h.update(folder_name.encode("utf-8") + b"\0")
+            for full_path, rel_path in iter_template_files(folder_path):
+                try:
+                    st = os.stat(full_path)
+                except OSError:
+                    continue
+                h.update(f"{rel_path}\0{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def _build(self) -> CatalogPayload:
+        templates = []
+        meta = {}
+
+        for folder_name, pretty_name, folder_path in self._folders():
+            files = {}
+            meta[folder_name] = {}
+            for full_path, rel_path in iter_template_files(folder_path):
+                try:
+                    with open(full_path, "rb") as f:
+                        raw = f.read()
+                except Exception:
+                    continue
+
+                files[rel_path] = raw.decode("utf-8", errors="ignore")
+                meta[folder_name][rel_path] = {
+                    "path": full_path,
+                    "size": len(raw),
+                    "sha256": hashlib.sha256(raw).hexdigest(),
+                }
+
+            templates.append({
+                "name": pretty_name,
+                "folder": folder_name,
+                "files": files
+            })
+
+        self.builds += 1
+        return CatalogPayload({"templates": templates}, meta)
+
+    def get(self) -> CatalogPayload:
+        now = time.time()
+
+        with self._lock:
+            if self._payload is not None and now - self._last_scan < self.scan_interval:
+                return self._payload
+
+            signature = self._scan()
+            self._last_scan = now
+
+            if signature != self._signature or self._payload is None:
+                self._payload = self._build()
+                self._signature = signature
+
+            return self._payload
@@ -0,0 +1,62 @@
+"""
+Metadatos de los templates (título, descripción, archivos y repositorio).
+Lo usan la preview del Manager y el redeploy masivo por template.
+"""
+
+# 🎨 Nombres bonitos
+TEMPLATE_INFO = {
+    "flask": {
+        "title": "Aplicación Flask",
+        "description": "Template base para aplicaciones Python usando Flask.",
+        "allowed": [
+            "Dockerfile",
+            "docker-compose.yml",
+            "app.py",
+            "requirements.txt"
+        ],
+        "repo": "https://github.com/Znake-G/flask-template.git"
+    },
+    "static_template": {
+        "title": "Sitio Web Estático",
+        "description": "Template HTML/CSS/JS sencillo.",
+        "allowed": [
+            "Dockerfile",
+            "docker-compose.yml",
+            "index.html"
+        ],
+        "repo": "https://github.com/Znake-G/static-template.git"
+    },
+    "template_react": {
+        "title": "Aplicación React",
+        "description": "Template de aplicación creada con React.",
+        "allowed": [
+            "Dockerfile",
+            "package.json",
+            "package-lock.json",
+            "public/index.html",
+            "src/App.js",
+            "src/App.css",
+            "src/index.js",
+            "src/index.css"
+        ],
+        "repo": "https://github.com/Znake-G/react_template.git"
+    }
+}
+
+VALID_TEMPLATES = list(TEMPLATE_INFO.keys())
+
+
+def normalizar_repo(url: str) -> str:
+    url = (url or "").strip().lower().rstrip("/")
+    return url[:-4] if url.endswith(".git") else url
+
+
+def template_de_repo(repo_url: str):
+    """
+    Carpeta del template cuyo repositorio es `repo_url`, o None.
+    """
+    repo = normalizar_repo(repo_url)
+    for folder, info in TEMPLATE_INFO.items():
+        if repo and normalizar_repo(info.get("repo")) == repo:
+            return folder
+    return None
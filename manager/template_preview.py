@@ -0,0 +1,211 @@
+"""
+Preview estático de templates con raíz resuelta y assets precomprimidos.
+
+Por template se guarda en memoria:
+  - la raíz desde la que se sirve (build, dist, public o la carpeta misma),
+  - el listado HTML de respaldo cuando no hay index.html,
+  - cada asset de texto ya comprimido en gzip (y brotli si el módulo
+    `brotli` está instalado), con un ETag distinto por codificación.
+    Los archivos de más de PREVIEW_MAX_ASSET_BYTES y los de node_modules,
+    .git, etc. quedan en la tabla sin comprimir (se sirven del disco).
+
+Solo se atienden las carpetas de TEMPLATE_INFO. Las previews se
+precalculan al arrancar (warm_all); brotli usa PREVIEW_BROTLI_QUALITY
+(5 por defecto) para que un recálculo en una petición siga siendo barato.
+
+Todo se recalcula solo cuando cambia la firma barata del template (rutas,
+tamaños, mtimes), revisada como mucho cada TEMPLATE_SCAN_INTERVAL
+segundos. Esta ruta la usa Nginx (/_preview_fallback) justamente cuando
+los contenedores de templates están caídos, así que tiene que ser barata.
+"""
+
+import os
+import gzip
+import time
+import hashlib
+import mimetypes
+import threading
+
+from template_catalog import SKIP_DIRS
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+# Orden en que se busca el index.html
+CANDIDATES = ["build", "dist", "public", ""]
+
+BROTLI_QUALITY = int(os.getenv("PREVIEW_BROTLI_QUALITY", "5"))
+
+# Sufijo del ETag de cada codificación (un ETag fuerte por representación)
+ETAG_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+# Tipos que vale la pena comprimir
+COMPRESSIBLE = (
+    "text/", "application/javascript", "application/json",
+    "application/xml", "image/svg+xml", "application/manifest+json"
+)
+
+
+class PreviewAsset:
+
+    def __init__(self, path: str, raw: bytes = None, stat: os.stat_result = None):
+        """
+        Con `raw` el ETag es el hash del contenido y se precomprime; sin
+        él (archivos que no se cargan en memoria) el ETag sale de `stat`.
+        """
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if raw is None:
+            self.etag = hashlib.sha256(
+                f"{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")
+            ).hexdigest()[:32]
+        else:
+            self.etag = hashlib.sha256(raw).hexdigest()[:32]
+
+        # encoding -> bytes (solo si comprimido es más chico)
+        self.variants = {}
+        if raw is not None and self.mimetype.startswith(COMPRESSIBLE) and len(raw) > 256:
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(raw, quality=BROTLI_QUALITY)
+            self.variants["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+            self.variants = {
+                enc: body for enc, body in self.variants.items() if len(body) < len(raw)
+            }
+
+    def etag_for(self, encoding: str = None) -> str:
+        return self.etag + ETAG_SUFFIX.get(encoding, "")
+
+
+class PreviewEntry:
+
+    def __init__(self, signature: str, root: str = None, listing: str = None):
+        self.signature = signature
+        self.root = root
+        self.listing = listing
+        # ruta relativa a root -> PreviewAsset
+        self.assets = {}
+        self.scanned_at = time.time()
+
+
+def _iter_files(base_dir, skip=SKIP_DIRS):
+    for root_dir, dirs, files in os.walk(base_dir):
+        dirs[:] = sorted(d for d in dirs if d not in skip)
+        for f in sorted(files):
+            full_path = os.path.join(root_dir, f)
+            yield full_path, os.path.relpath(full_path, base_dir)
+
+
+class PreviewCache:
+
+    def __init__(self, templates_dir: str, repos: dict = None):
+        """
+        `repos` es {carpeta: url del repo} de los templates válidos;
+        cualquier otra carpeta se trata como inexistente.
+        """
+        self.templates_dir = templates_dir
+        self.repos = repos or {}
+        self.scan_interval = float(os.getenv("TEMPLATE_SCAN_INTERVAL", "5"))
+        self.max_asset_bytes = int(os.getenv("PREVIEW_MAX_ASSET_BYTES", str(5 * 1024 * 1024)))
+
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, folder: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(folder, threading.Lock())
+
+    @staticmethod
+    def _signature(base_dir: str) -> str:
+        h = hashlib.sha256()
+        # Todos los archivos: cualquiera puede ser un asset de la preview
+        for full_path, rel_path in _iter_files(base_dir, skip=()):
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            h.update(f"{rel_path}\0{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def _listing(self, folder: str, base_dir: str) -> str:
+        items = [rel_path for _, rel_path in _iter_files(base_dir)]
+        repo = self.repos.get(folder, "")
+
+        html = ["<html><head><meta charset='utf-8'><title>Preview - {}</title></head><body>".format(folder)]
+        html.append("<h1>Preview mínimo: {}</h1>".format(folder))
+        if repo:
+            html.append('<p>Repo: <a href="{}" target="_blank" rel="noopener noreferrer">{}</a></p>'.format(repo, repo))
+        if items:
+            html.append("<h3>Archivos:</h3><ul>")
+            for it in sorted(items):
+                html.append("<li>{}</li>".format(it))
+            html.append("</ul>")
+        else:
+            html.append("<p>No hay archivos detectados en este template.</p>")
+        html.append("</body></html>")
+        return "".join(html)
+
+    def _build(self, folder: str, base_dir: str, signature: str) -> PreviewEntry:
+        for c in CANDIDATES:
+            root = os.path.join(base_dir, c) if c else base_dir
+            if os.path.isdir(root) and os.path.isfile(os.path.join(root, "index.html")):
+                entry = PreviewEntry(signature, root=root)
+                for full_path, rel_path in _iter_files(root, skip=()):
+                    skipped = SKIP_DIRS.intersection(rel_path.split(os.sep)[:-1])
+                    try:
+                        st = os.stat(full_path)
+                        if skipped or st.st_size > self.max_asset_bytes:
+                            asset = PreviewAsset(full_path, stat=st)
+                        else:
+                            with open(full_path, "rb") as f:
+                                asset = PreviewAsset(full_path, f.read())
+                    except OSError:
+                        continue
+                    entry.assets[rel_path.replace(os.sep, "/")] = asset
+                return entry
+
+        return PreviewEntry(signature, listing=self._listing(folder, base_dir))
+
+    def get(self, folder: str):
+        """
+        Devuelve el PreviewEntry del template, o None si no existe.
+        """
+        if folder not in self.repos:
+            return None
+
+        base_dir = os.path.join(self.templates_dir, folder)
+
+        with self._lock_for(folder):
+            entry = self._entries.get(folder)
+            now = time.time()
+
+            if entry and now - entry.scanned_at < self.scan_interval:
+                return entry
+
+            if not os.path.isdir(base_dir):
+                self._entries.pop(folder, None)
+                return None
+
+            signature = self._signature(base_dir)
+            if entry and entry.signature == signature:
+                entry.scanned_at = now
+                return entry
+
+            entry = self._build(folder, base_dir, signature)
+            self._entries[folder] = entry
+            return entry
+
+    def warm_all(self):
+        """
+        Precalcula la preview de todos los templates.
+        """
+        for folder in self.repos:
+            self.get(folder)
+
+    def start(self):
+        """
+        Precalcula las previews en segundo plano (no retrasa el arranque).
+        """
+        threading.Thread(target=self.warm_all, daemon=True).start()
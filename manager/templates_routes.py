@@ -1,8 +1,8 @@
 import os
-from flask import Blueprint, jsonify, send_file
-import zipfile
-from io import BytesIO
-from functools import lru_cache
+from flask import Blueprint, jsonify, send_file, request, Response
+
+from template_catalog import TemplateCatalog
+from template_archives import TemplateArchives
 
 templates_blueprint = Blueprint("templates", __name__)
 
@@ -13,94 +13,178 @@ TEMPLATE_MAP = {
     "template_react": "Aplicación React"
 }
 
-# Extensiones permitidas
-ALLOWED_EXT = {
-    ".html", ".js", ".css", ".json", ".py",
-    ".yml", ".yaml", ".md", ".txt"
-}
+# Catálogo precalculado (JSON + gzip + ETag), se reconstruye solo si
+# cambian los archivos de los templates
+catalog = TemplateCatalog(os.path.join(os.getcwd(), "templates"), TEMPLATE_MAP)
+catalog.get()
 
-# ⭐ LEE LOS ARCHIVOS CON CACHÉ (MUCHO MÁS RÁPIDO)
-@lru_cache(maxsize=None)
-def read_files_recursive_cached(base_path):
-    result = {}
 
-    for root, _, files in os.walk(base_path):
-        for file in files:
-            ext = os.path.splitext(file)[1].lower()
-            if ext not in ALLOWED_EXT:
-                continue
+def _acepta_gzip():
+    return request.accept_encodings["gzip"] > 0
 
-            full_path = os.path.join(root, file)
 
-            try:
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-            except Exception:
-                continue
+@templates_blueprint.route("/api/templates", methods=["GET"])
+def listar_templates():
+    """
+    Devuelve todos los templates con sus archivos.
+    La respuesta sale ya serializada; con If-None-Match se responde 304.
+    """
+    payload = catalog.get()
+    usa_gzip = _acepta_gzip()
+    etag = payload.etag_gzip if usa_gzip else payload.etag
 
-            rel_path = os.path.relpath(full_path, base_path)
-            result[rel_path] = content
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
 
-    return result
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
 
+    if usa_gzip:
+        headers["Content-Encoding"] = "gzip"
+        body = payload.gzip
+    else:
+        body = payload.identity
 
-@templates_blueprint.route("/api/templates", methods=["GET"])
-def listar_templates():
+    return Response(body, status=200, mimetype="application/json", headers=headers)
+
+
+# =============================================================
+# LISTADO LIVIANO + ARCHIVOS BAJO DEMANDA
+# =============================================================
+
+# Archivos por template incluidos directamente en /api/templates/index
+TREE_INLINE_LIMIT = int(os.getenv("TEMPLATE_TREE_INLINE_LIMIT", "200"))
+
+
+def _pagina(items, default_per_page):
     """
-    Devuelve todos los templates con sus archivos.
-    Ahora con lectura cacheada para evitar recargar archivos cada vez.
+    Aplica ?page=&per_page= a una lista. Lanza ValueError si no son válidos.
     """
-    templates_dir = os.path.join(os.getcwd(), "templates")
-    templates = []
+    page = int(request.args.get("page", 1))
+    per_page = int(request.args.get("per_page", default_per_page))
+    if page < 1 or per_page < 1:
+        raise ValueError("page y per_page deben ser >= 1")
+
+    start = (page - 1) * per_page
+    return items[start:start + per_page], {
+        "page": page,
+        "per_page": per_page,
+        "total": len(items),
+        "has_more": start + per_page < len(items),
+    }
 
-    for folder_name, pretty_name in TEMPLATE_MAP.items():
-        folder_path = os.path.join(templates_dir, folder_name)
 
-        if not os.path.isdir(folder_path):
-            continue
+def _arbol(files: dict):
+    return [
+        {"path": rel_path, "size": info["size"], "sha256": info["sha256"]}
+        for rel_path, info in files.items()
+    ]
 
-        files = read_files_recursive_cached(folder_path)
 
+@templates_blueprint.route("/api/templates/index", methods=["GET"])
+def indice_templates():
+    """
+    Solo metadatos: nombre, carpeta y árbol de archivos (ruta, tamaño,
+    sha256), sin contenido. Si un template tiene más de
+    TEMPLATE_TREE_INLINE_LIMIT archivos, el resto se pide a
+    /api/templates/<folder>/files.
+    """
+    payload = catalog.get()
+
+    templates = []
+    for t in payload.data["templates"]:
+        tree = _arbol(payload.files.get(t["folder"], {}))
         templates.append({
-            "name": pretty_name,
-            "folder": folder_name,
-            "files": files
+            "name": t["name"],
+            "folder": t["folder"],
+            "file_count": len(tree),
+            "size": sum(f["size"] for f in tree),
+            "files": tree[:TREE_INLINE_LIMIT],
+            "files_truncated": len(tree) > TREE_INLINE_LIMIT,
         })
 
-    return jsonify({"templates": templates})
+    try:
+        templates, pagination = _pagina(templates, default_per_page=50)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify({"templates": templates, "pagination": pagination})
+    # Débil: el proxy puede comprimir la respuesta sin cambiar el ETag
+    response.set_etag(payload.etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@templates_blueprint.route("/api/templates/<template_folder>/files", methods=["GET"])
+def arbol_template(template_folder):
+    """
+    Árbol de archivos paginado (?page=&per_page=).
+    """
+    files = catalog.get().files.get(template_folder)
+    if files is None:
+        return jsonify({"error": "Template no encontrado"}), 404
+
+    try:
+        tree, pagination = _pagina(_arbol(files), default_per_page=TREE_INLINE_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"folder": template_folder, "files": tree, "pagination": pagination})
 
 
-# Crear ZIP del template
-def zip_directory(folder_path):
-    zip_buffer = BytesIO()
+@templates_blueprint.route("/api/templates/<template_folder>/files/<path:file_path>", methods=["GET"])
+def archivo_template(template_folder, file_path):
+    """
+    Contenido de un único archivo del catálogo (con Range y ETag).
+    Solo se sirven archivos presentes en el catálogo.
+    """
+    info = catalog.get().files.get(template_folder, {}).get(file_path)
+    if info is None:
+        return jsonify({"error": "Archivo no encontrado"}), 404
+
+    response = send_file(
+        info["path"],
+        mimetype="text/plain",
+        etag=info["sha256"][:32],
+        max_age=0,
+        conditional=True
+    )
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, folder_path)
-                zip_file.write(file_path, arcname)
+# ZIPs cacheados en disco por hash de contenido
+archives = TemplateArchives()
 
-    zip_buffer.seek(0)
-    return zip_buffer
+ZIP_MAX_AGE = int(os.getenv("TEMPLATE_ZIP_MAX_AGE", "300"))
 
 
 @templates_blueprint.route("/api/templates/<template_folder>/download", methods=["GET"])
 def descargar_template(template_folder):
     """
     Descarga el ZIP del template.
-    Se mantiene igual al original.
+    El ZIP se genera una vez por versión del contenido y se sirve desde
+    disco (sendfile), con soporte de Range y revalidación por ETag.
     """
     base_dir = os.path.join(os.getcwd(), "templates", template_folder)
 
-    if not os.path.isdir(base_dir):
+    if template_folder.startswith(".") or not os.path.isdir(base_dir):
         return jsonify({"error": "Template no encontrado"}), 404
 
-    zip_data = zip_directory(base_dir)
+    zip_path, content_hash = archives.get(template_folder, base_dir)
 
-    return send_file(
-        zip_data,
+    response = send_file(
+        zip_path,
         mimetype="application/zip",
         as_attachment=True,
-        download_name=f"{template_folder}.zip"
+        download_name=f"{template_folder}.zip",
+        etag=content_hash[:32],
+        max_age=ZIP_MAX_AGE,
+        conditional=True
     )
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
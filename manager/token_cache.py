@@ -0,0 +1,102 @@
+"""
+Caché en memoria de las verificaciones de token contra Roble.
+
+Cada entrada se guarda bajo el hash SHA-256 del token (nunca el token en
+claro) y expira en lo que ocurra primero: el TTL configurado o el `exp`
+del propio JWT.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import cache_requests
+
+
+def token_exp(token: str):
+    """
+    Devuelve el claim `exp` (epoch en segundos) del JWT sin validar la
+    firma, o None si el token no se puede decodificar.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        data = json.loads(base64.urlsafe_b64decode(payload))
+        exp = data.get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+class TokenCache:
+    """
+    LRU acotado de resultados de verify-token.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+        self.max_size = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        """
+        Devuelve el resultado cacheado o None si no existe o ya expiró.
+        """
+        key = self._key(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                cache_requests.inc("token", "miss")
+                return None
+
+            expires_at, result = entry
+            if expires_at <= now:
+                del self._data[key]
+                cache_requests.inc("token", "miss")
+                return None
+
+            self._data.move_to_end(key)
+            cache_requests.inc("token", "hit")
+            return result
+
+    def set(self, token: str, result):
+        expires_at = time.time() + self.ttl
+
+        exp = token_exp(token)
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+
+        if expires_at <= time.time():
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._data[key] = (expires_at, result)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._data.pop(self._key(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Instancia global (compartida por todos los RobleClient del proceso)
+token_cache = TokenCache()
@@ -0,0 +1,51 @@
+"""
+Ruta interna que usa el proxy para despertar contenedores hibernados.
+
+El puerto del Manager está publicado, así que la ruta solo atiende
+peticiones cuyo origen es uno de WAKE_ALLOWED_HOSTS (por defecto el
+contenedor `proxy` de docker-compose; nombres o IPs separados por coma).
+"""
+
+from flask import Blueprint, request, jsonify, redirect
+import os
+import socket
+
+from hibernation import hibernation
+
+wake_blueprint = Blueprint("wake", __name__)
+
+WAKE_ALLOWED_HOSTS = [
+    h.strip() for h in os.getenv("WAKE_ALLOWED_HOSTS", "proxy").split(",") if h.strip()
+]
+
+
+def _origen_permitido(addr: str) -> bool:
+    """
+    True si `addr` es la IP de alguno de WAKE_ALLOWED_HOSTS. Los nombres
+    se resuelven en cada llamada (la IP del proxy cambia al recrearlo).
+    """
+    for host in WAKE_ALLOWED_HOSTS:
+        try:
+            ips = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except socket.gaierror:
+            continue
+        if addr in ips:
+            return True
+    return False
+
+
+@wake_blueprint.route("/<host>", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"])
+def wake(host):
+    """
+    Nginx reenvía aquí la petición cuando el upstream del proyecto falla.
+    Si el contenedor estaba hibernado se despierta y se redirige (307,
+    conserva método y cuerpo) a la URL original.
+    """
+    if not _origen_permitido(request.remote_addr or ""):
+        return jsonify({"error": "No autorizado"}), 403
+
+    if not hibernation.wake(host):
+        return jsonify({"error": "Proyecto no disponible"}), 502
+
+    original = request.headers.get("X-Original-URI", "/")
+    return redirect(original, code=307)